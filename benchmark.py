@@ -0,0 +1,393 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from constants import *
+from vector3d import Vector3d
+from camera import Camera
+from closesthit import ClosestHit
+from image import Image
+from renderstats import RenderStats
+from sphere import Sphere
+from scenestore import SceneStore
+from bvh import BVH
+
+
+def benchmarkImage(t):
+    """Fixed benchmark scene: the animation camera and scene at time t."""
+    camera = Camera(
+        lookFrom=Vector3d(0, 3, 8),
+        lookAt=Vector3d(0, 0, -2),
+        vUp=Vector3d(0, 1, 0),
+        vfov=60.0,
+        aspect=CAMERA_ASPECT
+    )
+    image = Image(camera, seed=SAMPLE_SEED)
+    image.createAnimatedScene(t)
+    return image
+
+
+def screenSamples(image, stride=BENCHMARK_PIXEL_STRIDE):
+    """(s, t) of the first AA sample of every stride-th pixel, as samplePixel draws them."""
+    samples = []
+    for row in range(0, IMAGE_HEIGHT, stride):
+        for col in range(0, IMAGE_WIDTH, stride):
+            du, dv = image.sampler.beginSample(col, row, 0)
+            samples.append(((col + du) / (IMAGE_WIDTH - 1), (row + dv) / (IMAGE_HEIGHT - 1)))
+    return samples
+
+
+def syntheticScene(count, seed=BENCHMARK_SEED):
+    """
+    `count` random spheres filling a fixed box in front of the benchmark
+    camera. Radii shrink with the count so the box stays equally crowded.
+    """
+    rng = random.Random(seed)
+    radius = 2.0 / count ** (1.0 / 3.0)
+    return SceneStore(Sphere(Vector3d(rng.uniform(-4, 4), rng.uniform(-1, 3), rng.uniform(-8, 0)),
+                             radius, WHITE)
+                      for _ in range(count))
+
+
+def primaryHits(image, rays):
+    """(ray, hit record) of every ray that hits a sphere; one record per hit."""
+    hits = []
+    for ray in rays:
+        index, t = image.accelerator.closestHit(ray)
+        if index >= 0:
+            hit_record = ClosestHit()
+            image.recordHit(ray, image.scene.spheres[index], t, hit_record)
+            hits.append((ray, hit_record))
+    return hits
+
+
+def countRays(image, workload):
+    """
+    Rays one run of workload traces through image (primary, reflection and
+    shadow), counted once with RenderStats outside the timing.
+    """
+    stats = RenderStats()
+    with stats.instrument(image):
+        workload()
+    return stats.primary_rays + stats.reflection_rays + stats.shadow_rays
+
+
+def measure(workload, min_time=BENCHMARK_MIN_TIME, repeat=BENCHMARK_REPEAT):
+    """
+    Seconds per call of workload as (best, median) over `repeat` timed runs.
+    Each run calls workload enough times to last at least min_time.
+    """
+    workload()  # Warm-up: caches, lazily built tables
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            workload()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        calls *= 2
+
+    times = [elapsed / calls]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(calls):
+            workload()
+        times.append((time.perf_counter() - start) / calls)
+    times.sort()
+    return times[0], times[len(times) // 2]
+
+
+class Benchmark:
+    """
+    Runs the hot-path microbenchmarks and collects their results.
+    Each result reports ns/op, ops/sec and, for workloads that trace rays,
+    rays/sec (rays counted per operation before timing). Scenes, camera
+    samples and vector operands are fixed, so runs are comparable.
+    """
+    def __init__(self, min_time=BENCHMARK_MIN_TIME, repeat=BENCHMARK_REPEAT,
+                 scene_times=BENCHMARK_SCENE_TIMES, frame_scales=BENCHMARK_FRAME_SCALES,
+                 engines=None, only=None, bvh_sizes=BENCHMARK_BVH_SIZES):
+        """only limits the run to benchmark names containing one of its strings."""
+        self.min_time = min_time
+        self.repeat = repeat
+        self.scene_times = scene_times
+        self.frame_scales = frame_scales
+        self.bvh_sizes = bvh_sizes
+        self.engines = engines or availableEngines()
+        self.only = only
+        self.results = []
+
+    def selected(self, name):
+        """True if benchmark `name` passes the `only` filter."""
+        return not self.only or any(part in name for part in self.only)
+
+    def run(self, name, workload, ops, rays=None, scene_t=None, **extra):
+        """
+        Time workload (ops operations, tracing `rays` rays per call) and
+        record it. rays may be a callable, evaluated only if the benchmark runs.
+        """
+        if not self.selected(name):
+            return None
+        if callable(rays):
+            rays = rays()
+        best, median = measure(workload, self.min_time, self.repeat)
+        result = {
+            "name": name,
+            "scene_t": scene_t,
+            "ops": ops,
+            "ns_per_op": best / ops * 1e9,
+            "ns_per_op_median": median / ops * 1e9,
+            "ops_per_sec": ops / best,
+        }
+        if rays is not None:
+            result["rays"] = rays
+            result["rays_per_sec"] = rays / best
+        result.update(extra)
+        self.results.append(result)
+        return result
+
+    def vectorBenchmarks(self, count=512):
+        """Vector3d arithmetic and normalization over fixed random operands."""
+        rng = random.Random(BENCHMARK_SEED)
+        a = [Vector3d(rng.uniform(-10, 10), rng.uniform(-10, 10), rng.uniform(-10, 10))
+             for _ in range(count)]
+        b = [Vector3d(rng.uniform(-10, 10), rng.uniform(-10, 10), rng.uniform(-10, 10))
+             for _ in range(count)]
+        pairs = list(zip(a, b))
+
+        self.run("Vector3d.__add__", lambda: [u + v for u, v in pairs], count)
+        self.run("Vector3d.__sub__", lambda: [u - v for u, v in pairs], count)
+        self.run("Vector3d.__mul__", lambda: [u * 0.5 for u in a], count)
+        self.run("Vector3d.dot", lambda: [u.dot(v) for u, v in pairs], count)
+        self.run("Vector3d.cross", lambda: [u.cross(v) for u, v in pairs], count)
+        self.run("Vector3d.normalize", lambda: [u.normalize() for u in a], count)
+        self.run("Vector3d.addScaled", lambda: [u.copy().addScaled(v, 0.5) for u, v in pairs],
+                 count)
+        # Normalizing already unit vectors keeps the operands stable between runs
+        units = [u.normalize() for u in a]
+        self.run("Vector3d.normalizeInPlace", lambda: [u.normalizeInPlace() for u in units],
+                 count)
+
+    def sceneBenchmarks(self, t):
+        """Intersection, camera and shading benchmarks for the scene at time t."""
+        image = benchmarkImage(t)
+        camera = image.camera
+        samples = screenSamples(image)
+        rays = [camera.getARay(s, v) for s, v in samples]
+        hits = primaryHits(image, rays)
+
+        self.run("Camera.getARay", lambda: [camera.getARay(s, v) for s, v in samples],
+                 len(samples), len(samples), t)
+
+        def buildGrid():
+            for row in range(IMAGE_HEIGHT):
+                camera.primaryDirections(image.sampler, 0, row)
+        pixels = IMAGE_WIDTH * IMAGE_HEIGHT
+        self.run("Camera.primaryDirections", buildGrid, pixels, pixels, t)
+
+        spheres = image.scene.spheres
+        tests = len(rays) * len(spheres)
+        self.run("Sphere.rayIntersect",
+                 lambda: [sphere.rayIntersect(ray) for ray in rays for sphere in spheres],
+                 tests, tests, t)
+
+        if hits:
+            lights = image.lights
+            shade = image.calcBlinnPhongShading
+            self.run("Image.calcBlinnPhongShading",
+                     lambda: [shade(ray, hit, light) for ray, hit in hits for light in lights],
+                     len(hits) * len(lights), None, t, hit_fraction=len(hits) / len(rays))
+
+            shadows = image.calcShadows
+            workload = lambda: [shadows(hit, light) for _, hit in hits for light in lights]
+            self.run("Image.calcShadows", workload, len(hits) * len(lights),
+                     lambda: countRays(image, workload), t)
+
+        # Looked up per call so countRays sees the top-level calls too
+        workload = lambda: [image.calculatePixelColor(ray) for ray in rays]
+        self.run("Image.calculatePixelColor", workload, len(rays),
+                 lambda: countRays(image, workload), t)
+
+    def bvhBenchmarks(self):
+        """
+        BVH closest-hit and any-hit queries over synthetic scenes of
+        bvh_sizes spheres, with the build time and nodes visited per ray of
+        each, to check that the cost per ray grows sub-linearly.
+        """
+        queries = [name for name in ("BVH.closestHitRaw", "BVH.occluderRaw")
+                   if self.selected(name)]
+        if not queries:
+            return
+        image = benchmarkImage(0.0)
+        rays = []
+        for s, v in screenSamples(image):
+            ray = image.camera.getARay(s, v)
+            origin = ray.getOrigin()
+            direction = ray.getDirection()
+            rays.append((origin.x, origin.y, origin.z, direction.x, direction.y, direction.z))
+
+        for count in self.bvh_sizes:
+            bvh = BVH(syntheticScene(count))
+            for name in queries:
+                query = getattr(bvh, name.split(".")[1])
+                workload = lambda: [query(*ray) for ray in rays]
+                bvh.resetStats()
+                workload()
+                stats = bvh.stats()
+                self.run(name, workload, len(rays), len(rays), spheres=count,
+                         build_time=stats["build_time"], nodes=stats["nodes"],
+                         max_depth=stats["max_depth"], nodes_per_ray=stats["nodes_per_ray"],
+                         tests_per_ray=stats["tests_per_ray"])
+
+    def frameBenchmarks(self, t):
+        """
+        Whole-frame renders of the scene at time t. Resolution is fixed by
+        IMAGE_WIDTH x IMAGE_HEIGHT, so smaller sizes trace a centred window
+        of the frame; the full size runs renderFrame, file write included.
+        """
+        with tempfile.TemporaryDirectory(prefix="benchmark_") as directory:
+            for engine in self.engines:
+                for scale in self.frame_scales:
+                    self.frameBenchmark(t, engine, scale, directory)
+
+    def frameBenchmark(self, t, engine, scale, directory):
+        """One frame benchmark; full-size frames are written to directory."""
+        name = f"renderFrame[{engine}]"
+        if not self.selected(name):
+            return
+        image = benchmarkImage(t)
+        width = max(1, int(IMAGE_WIDTH * scale))
+        height = max(1, int(IMAGE_HEIGHT * scale))
+        x0 = (IMAGE_WIDTH - width) // 2
+        y0 = (IMAGE_HEIGHT - height) // 2
+
+        if width == IMAGE_WIDTH and height == IMAGE_HEIGHT:
+            workload = lambda: image.renderFrame("frame.ppm", engine, output_dir=directory)
+        else:
+            workload = lambda: image.traceRegion(engine, x0, y0, x0 + width, y0 + height)
+
+        # The NumPy engine cannot be instrumented per ray; count primary rays
+        if engine == RENDER_ENGINE_NUMPY:
+            rays = width * height * ANTI_ALIASING_SAMPLES
+        else:
+            rays = lambda: countRays(image, workload)
+        self.run(name, workload, width * height, rays, t, engine=engine,
+                 resolution=f"{width}x{height}",
+                 ray_count="primary" if engine == RENDER_ENGINE_NUMPY else "all")
+
+    def runAll(self, frames=True):
+        """Run every benchmark; returns the results."""
+        self.vectorBenchmarks()
+        for t in self.scene_times:
+            self.sceneBenchmarks(t)
+        self.bvhBenchmarks()
+        if frames:
+            for t in self.scene_times:
+                self.frameBenchmarks(t)
+        return self.results
+
+    def report(self):
+        """Machine-readable results plus the settings they were measured with."""
+        return {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "settings": {
+                "resolution": f"{IMAGE_WIDTH}x{IMAGE_HEIGHT}",
+                "anti_aliasing_samples": ANTI_ALIASING_SAMPLES,
+                "soft_shadow_samples": SOFT_SHADOW_SAMPLES,
+                "max_ray_depth": MAX_RAY_DEPTH,
+                "sample_seed": SAMPLE_SEED,
+                "benchmark_seed": BENCHMARK_SEED,
+                "min_time": self.min_time,
+                "repeat": self.repeat,
+            },
+            "results": self.results,
+        }
+
+
+def availableEngines():
+    """Render engines that can run here (NumPy only if it is installed)."""
+    engines = [RENDER_ENGINE_PYTHON]
+    try:
+        import numpy  # noqa: F401
+        engines.append(RENDER_ENGINE_NUMPY)
+    except ImportError:
+        pass
+    return engines
+
+
+def formatResult(result):
+    """One table line for a result."""
+    scene = "" if result["scene_t"] is None else f"t={result['scene_t']:.1f}"
+    name = result["name"]
+    if "resolution" in result:
+        name += f" {result['resolution']}"
+    if "spheres" in result:
+        name += f" {result['spheres']} spheres"
+    line = f"{name:<38} {scene:<6} {result['ns_per_op']:>12.1f} ns/op"
+    if "rays_per_sec" in result:
+        line += f" {result['rays_per_sec']:>12.0f} rays/s"
+    if "nodes_per_ray" in result:
+        line += (f" {result['nodes_per_ray']:>7.1f} nodes/ray"
+                 f" (built in {result['build_time']:.2f}s)")
+    return line
+
+
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Benchmark the ray tracer's hot paths.")
+    parser.add_argument("--output", default=None, metavar="PATH",
+                        help="write the JSON report here ('-' for stdout)")
+    parser.add_argument("--only", default=None, metavar="NAMES",
+                        help="comma-separated substrings of the benchmarks to run")
+    parser.add_argument("--engines", default=None,
+                        help="comma-separated render engines for the frame benchmarks")
+    parser.add_argument("--no-frames", action="store_true",
+                        help="skip the whole-frame benchmarks")
+    parser.add_argument("--quick", action="store_true",
+                        help="short runs (min time 0.05s, 3 repeats) for a rough check")
+    parser.add_argument("--min-time", type=float, default=BENCHMARK_MIN_TIME,
+                        help="seconds each timed run lasts at least")
+    parser.add_argument("--repeat", type=int, default=BENCHMARK_REPEAT,
+                        help="timed runs per benchmark")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.min_time = 0.05
+        args.repeat = 3
+    return args
+
+
+def main(argv=None):
+    """Run the benchmarks, print a summary and optionally write JSON."""
+    args = parse_args(argv)
+    benchmark = Benchmark(args.min_time, args.repeat,
+                          engines=args.engines.split(",") if args.engines else None,
+                          only=args.only.split(",") if args.only else None)
+
+    # With JSON on stdout the table goes to stderr
+    table = sys.stderr if args.output == "-" else sys.stdout
+    benchmark.runAll(frames=not args.no_frames)
+    for result in benchmark.results:
+        print(formatResult(result), file=table)
+
+    if args.output == "-":
+        json.dump(benchmark.report(), sys.stdout, indent=1)
+        print()
+    elif args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(benchmark.report(), f, indent=1)
+        print(f"\nResults written to {args.output}", file=table)
+
+
+if __name__ == "__main__":
+    main()
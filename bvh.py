@@ -0,0 +1,225 @@
+import math
+import time
+from array import array
+from constants import *
+from scenestore import RayQueries, INFINITY
+
+# Stand-in for a zero direction component so slab tests stay finite
+TINY_DIRECTION = 1e-30
+
+
+class BVH(RayQueries):
+    """
+    Bounding volume hierarchy over the spheres of a SceneStore.
+    Nodes are axis-aligned boxes kept in flat arrays. Interior nodes store
+    the index of their left child (the right child follows it); leaves store
+    a run of sphere indices in `order`. Answers the same closest-hit and
+    any-hit queries as SceneStore, returning indices into the same store.
+    """
+    def __init__(self, scene, leaf_size=BVH_LEAF_SIZE):
+        """Build the hierarchy with median splits on the widest centroid axis."""
+        start_time = time.perf_counter()
+        self.scene = scene
+        self.leaf_size = leaf_size
+
+        self.min_x = array('d')
+        self.min_y = array('d')
+        self.min_z = array('d')
+        self.max_x = array('d')
+        self.max_y = array('d')
+        self.max_z = array('d')
+        self.child = array('l')   # Left child (interior) or first entry in order (leaf)
+        self.count = array('l')   # Sphere count; 0 marks an interior node
+        self.axis = array('b')    # Split axis of interior nodes
+        self.order = array('l', range(len(scene)))
+
+        self.max_depth = 0
+        self.leaf_count = 0
+        if len(scene):
+            self._build()
+        self.build_time = time.perf_counter() - start_time
+
+        self.resetStats()
+
+    def __len__(self):
+        """Number of spheres in the hierarchy."""
+        return len(self.scene)
+
+    def _addNode(self):
+        """Append an empty node and return its index."""
+        for values in (self.min_x, self.min_y, self.min_z,
+                       self.max_x, self.max_y, self.max_z):
+            values.append(0.0)
+        self.child.append(0)
+        self.count.append(0)
+        self.axis.append(0)
+        return len(self.count) - 1
+
+    def _build(self):
+        """Iteratively split sphere ranges until they fit in a leaf."""
+        scene = self.scene
+        centers = (scene.center_x, scene.center_y, scene.center_z)
+        radii = scene.radii
+        order = self.order
+
+        stack = [(self._addNode(), 0, len(order), 0)]
+        while stack:
+            node, first, last, depth = stack.pop()
+            self.max_depth = max(self.max_depth, depth)
+            members = order[first:last]
+
+            # Node bounds enclose every sphere; centroid bounds choose the split
+            for axis, (lows, highs) in enumerate(((self.min_x, self.max_x),
+                                                  (self.min_y, self.max_y),
+                                                  (self.min_z, self.max_z))):
+                component = centers[axis]
+                lows[node] = min(component[i] - radii[i] for i in members)
+                highs[node] = max(component[i] + radii[i] for i in members)
+
+            extents = []
+            for component in centers:
+                values = [component[i] for i in members]
+                extents.append(max(values) - min(values))
+            split_axis = extents.index(max(extents))
+
+            if last - first <= self.leaf_size or extents[split_axis] == 0:
+                self.child[node] = first
+                self.count[node] = last - first
+                self.leaf_count += 1
+                continue
+
+            component = centers[split_axis]
+            order[first:last] = array('l', sorted(members, key=component.__getitem__))
+            middle = (first + last) // 2
+
+            left = self._addNode()
+            self._addNode()
+            self.child[node] = left
+            self.axis[node] = split_axis
+            stack.append((left, first, middle, depth + 1))
+            stack.append((left + 1, middle, last, depth + 1))
+
+    def resetStats(self):
+        """Clear the traversal counters."""
+        self.rays = 0
+        self.nodes_visited = 0
+        self.sphere_tests = 0
+
+    def stats(self):
+        """Build and traversal statistics since the last resetStats()."""
+        rays = max(self.rays, 1)
+        return {
+            "spheres": len(self.scene),
+            "nodes": len(self.count),
+            "leaves": self.leaf_count,
+            "max_depth": self.max_depth,
+            "build_time": self.build_time,
+            "rays": self.rays,
+            "nodes_visited": self.nodes_visited,
+            "sphere_tests": self.sphere_tests,
+            "nodes_per_ray": self.nodes_visited / rays,
+            "tests_per_ray": self.sphere_tests / rays,
+        }
+
+    def _traverse(self, ox, oy, oz, dx, dy, dz, any_hit, t_max=INFINITY):
+        """
+        Shared stack traversal over hits in (0, t_max). Returns (index, t) of
+        the closest hit, or of the first hit found when any_hit is set;
+        (-1, t_max) on miss.
+        """
+        if not self.count:
+            return -1, t_max
+
+        inv_x = 1.0 / (dx or TINY_DIRECTION)
+        inv_y = 1.0 / (dy or TINY_DIRECTION)
+        inv_z = 1.0 / (dz or TINY_DIRECTION)
+        direction_signs = (dx < 0, dy < 0, dz < 0)
+        a = dx * dx + dy * dy + dz * dz
+
+        min_x, min_y, min_z = self.min_x, self.min_y, self.min_z
+        max_x, max_y, max_z = self.max_x, self.max_y, self.max_z
+        child, count, axis, order = self.child, self.count, self.axis, self.order
+        scene = self.scene
+        center_x, center_y, center_z = scene.center_x, scene.center_y, scene.center_z
+        radii_sq = scene.radii_sq
+
+        best_t = t_max
+        best_index = -1
+        visited = 0
+        tests = 0
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            visited += 1
+
+            # Slab test against the node box
+            t0 = (min_x[node] - ox) * inv_x
+            t1 = (max_x[node] - ox) * inv_x
+            if t0 > t1:
+                t0, t1 = t1, t0
+            ty0 = (min_y[node] - oy) * inv_y
+            ty1 = (max_y[node] - oy) * inv_y
+            if ty0 > ty1:
+                ty0, ty1 = ty1, ty0
+            tz0 = (min_z[node] - oz) * inv_z
+            tz1 = (max_z[node] - oz) * inv_z
+            if tz0 > tz1:
+                tz0, tz1 = tz1, tz0
+            t_near = max(t0, ty0, tz0)
+            t_far = min(t1, ty1, tz1)
+            if t_far < t_near or t_far <= 0 or t_near > best_t:
+                continue
+
+            n = count[node]
+            if n == 0:
+                # Visit the child on the ray's side of the split first
+                left = child[node]
+                if direction_signs[axis[node]]:
+                    stack.append(left)
+                    stack.append(left + 1)
+                else:
+                    stack.append(left + 1)
+                    stack.append(left)
+                continue
+
+            first = child[node]
+            for index in order[first:first + n]:
+                tests += 1
+                ocx = ox - center_x[index]
+                ocy = oy - center_y[index]
+                ocz = oz - center_z[index]
+                half_b = ocx * dx + ocy * dy + ocz * dz
+                c = ocx * ocx + ocy * ocy + ocz * ocz - radii_sq[index]
+                discriminant = half_b * half_b - a * c
+                if discriminant >= 0:
+                    sqrt_disc = math.sqrt(discriminant)
+                    t = (-half_b - sqrt_disc) / a
+                    if t <= 0:
+                        t = (-half_b + sqrt_disc) / a
+                    if 0 < t < best_t:
+                        best_t = t
+                        best_index = index
+                        if any_hit:
+                            stack.clear()
+                            break
+
+        self.rays += 1
+        self.nodes_visited += visited
+        self.sphere_tests += tests
+        return best_index, best_t
+
+    def closestHitRaw(self, ox, oy, oz, dx, dy, dz):
+        """Return (index, t) of the nearest hit for one ray; (-1, inf) on miss."""
+        return self._traverse(ox, oy, oz, dx, dy, dz, False)
+
+    def occluderRaw(self, ox, oy, oz, dx, dy, dz, t_max=INFINITY):
+        """Index of the first sphere found hit in (0, t_max), or -1."""
+        return self._traverse(ox, oy, oz, dx, dy, dz, True, t_max)[0]
+
+    def anyHitRaw(self, ox, oy, oz, dx, dy, dz, t_max=INFINITY):
+        """Return True if one ray hits any sphere at a parameter in (0, t_max)."""
+        return self._traverse(ox, oy, oz, dx, dy, dz, True, t_max)[0] >= 0
+
+    def hitsSphereRaw(self, index, ox, oy, oz, dx, dy, dz, t_max=INFINITY):
+        """Return True if one ray hits sphere `index` in (0, t_max)."""
+        return self.scene.hitsSphereRaw(index, ox, oy, oz, dx, dy, dz, t_max)
@@ -1,8 +1,13 @@
 import math
+from array import array
 from vector3d import Vector3d
 from ray import Ray
 from constants import *
 
+# Primary direction grids shared by every Camera in the process, keyed by
+# camera state and resolution (the last DIRECTION_CACHE_GRIDS of them)
+_direction_grids = {}
+
 class Camera:
     def __init__(self, lookFrom, lookAt, vUp, vfov, aspect):
         """Initialize camera for Sugar Plum Fairy animation."""
@@ -34,15 +39,136 @@ class Camera:
                           (self.horizontal * 0.5) - 
                           (self.vertical * 0.5) - 
                           self.w)
+        
+        # The primary direction grid of the old camera state no longer applies
+        self.direction_grid = None
+
+    def __getstate__(self):
+        """Pickle without the direction grid (workers share their own cache)."""
+        state = self.__dict__.copy()
+        state["direction_grid"] = None
+        return state
 
     def getARay(self, s, t):
         """Get ray for current camera position."""
-        direction = (self.lower_left + 
-                    self.horizontal * s + 
-                    self.vertical * t - 
-                    self.origin)
+        direction = self.lower_left - self.origin
+        direction.addScaled(self.horizontal, s).addScaled(self.vertical, t)
         return Ray(self.origin, direction)
 
+    def directionGrid(self, width=IMAGE_WIDTH, height=IMAGE_HEIGHT):
+        """
+        Unnormalized primary ray directions through the lower-left corner of
+        every pixel of a width x height frame, as a flat x, y, z array (row 0,
+        the bottom row, first). The grid does not depend on the sampler, so
+        it is shared by every Camera with the same state and resolution, e.g.
+        all frames of a fixed-camera job rendered by one process.
+        """
+        grid = self.direction_grid
+        if grid is not None and grid[0] == (width, height):
+            return grid[1]
+        key = (width, height) + tuple(vector.to_tuple() for vector in (
+            self.origin, self.lower_left, self.horizontal, self.vertical))
+        directions = _direction_grids.get(key)
+        if directions is None:
+            if len(_direction_grids) >= DIRECTION_CACHE_GRIDS:
+                del _direction_grids[next(iter(_direction_grids))]
+            directions = _direction_grids[key] = self._buildGrid(width, height)
+        self.direction_grid = ((width, height), directions)
+        return directions
+
+    def _buildGrid(self, width, height):
+        """Compute directionGrid's values."""
+        origin = self.origin
+        base_x = self.lower_left.x - origin.x
+        base_y = self.lower_left.y - origin.y
+        base_z = self.lower_left.z - origin.z
+        h = self.horizontal
+        v = self.vertical
+        columns = [(h.x * s, h.y * s, h.z * s)
+                   for s in (col / (width - 1) for col in range(width))]
+
+        grid = array('d')
+        for row in range(height):
+            t = row / (height - 1)
+            row_x = base_x + v.x * t
+            row_y = base_y + v.y * t
+            row_z = base_z + v.z * t
+            for x, y, z in columns:
+                grid.extend((row_x + x, row_y + y, row_z + z))
+        return grid
+
+    def primaryDirections(self, sampler, sample, row, width=IMAGE_WIDTH, height=IMAGE_HEIGHT,
+                          x0=0, x1=None):
+        """
+        Normalized primary ray directions of AA sample `sample` for columns
+        x0 .. x1 - 1 of pixel row `row` of a width x height frame, as a flat
+        x, y, z array (column x0 first): the cached directionGrid moved by
+        each pixel's scrambled sub-pixel offset.
+        """
+        if x1 is None:
+            x1 = width
+        return self._directions(sampler, sample, row, range(x0, x1), width, height)
+
+    def primaryDirection(self, sampler, sample, col, row, width=IMAGE_WIDTH, height=IMAGE_HEIGHT):
+        """The (x, y, z) primary direction of a single pixel (see primaryDirections)."""
+        return tuple(self._directions(sampler, sample, row, (col,), width, height))
+
+    def _directions(self, sampler, sample, row, cols, width, height):
+        """Directions of the pixels `cols` of a row, in order."""
+        grid = self.directionGrid(width, height)
+        h = self.horizontal
+        v = self.vertical
+        scale_u = 1.0 / (width - 1)
+        scale_v = 1.0 / (height - 1)
+        h_x, h_y, h_z = h.x * scale_u, h.y * scale_u, h.z * scale_u
+        v_x, v_y, v_z = v.x * scale_v, v.y * scale_v, v.z * scale_v
+
+        i = (sample % sampler.table_size) * 2
+        point_u = sampler.pixel_table[i]
+        point_v = sampler.pixel_table[i + 1]
+        shifts = sampler.pixel_shifts
+        tile = sampler.tile_size
+        row_cell = (row % tile) * tile
+        row_start = row * width * 3
+
+        directions = array('d', bytes(8 * 3 * len(cols)))
+        for j, col in enumerate(cols):
+            cell = (row_cell + col % tile) * 2
+            du = (point_u + shifts[cell]) % 1.0
+            dv = (point_v + shifts[cell + 1]) % 1.0
+            k = row_start + col * 3
+            x = grid[k] + h_x * du + v_x * dv
+            y = grid[k + 1] + h_y * du + v_y * dv
+            z = grid[k + 2] + h_z * du + v_z * dv
+            length = math.sqrt(x * x + y * y + z * z)
+            j *= 3
+            directions[j] = x / length
+            directions[j + 1] = y / length
+            directions[j + 2] = z / length
+        return directions
+
+    def projectPoint(self, point):
+        """
+        Inverse of getARay: the (s, t) screen coordinates whose ray passes
+        through point, or None if the point is not in front of the camera.
+        """
+        d = point - self.origin
+        depth = -d.dot(self.w)
+        if depth <= 1e-9:
+            return None
+        half_width = self.horizontal.length() * 0.5
+        half_height = self.vertical.length() * 0.5
+        s = (d.dot(self.u) / depth + half_width) / (2.0 * half_width)
+        t = (d.dot(self.v) / depth + half_height) / (2.0 * half_height)
+        return s, t
+
+    def setPose(self, lookFrom, lookAt):
+        """Move the camera (e.g. to a baked Timeline pose), keeping the world up vector."""
+        self.lookFrom = lookFrom
+        self.lookAt = lookAt
+        self.vUp = Vector3d(0, 1, 0)
+        self._updateCamera()
+
     def updateForAnimation(self, t):
         """
         Update camera for Christmas ballet animation.
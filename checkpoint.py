@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import constants
+from constants import *
+
+
+def settingsHash(options=None, constant_names=()):
+    """
+    SHA-256 over the named render constants (those that change frame
+    contents, see main.FRAME_CONSTANTS) plus per-run options (engine,
+    format, sampling mode, ...). Frames rendered under a different hash
+    are stale.
+    """
+    settings = {name: repr(getattr(constants, name)) for name in constant_names}
+    settings["options"] = repr(sorted((options or {}).items()))
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def fileChecksum(path):
+    """Return (sha256 hex digest, size in bytes) of a file."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+            size += len(block)
+    return digest.hexdigest(), size
+
+
+class FrameManifest:
+    """
+    JSON record of completed frames for resuming an interrupted render.
+    Each entry holds the settings hash the frame was rendered with, its
+    output path, size and SHA-256, plus the same for its PNG conversion.
+    A frame counts as done only if all of these still match on disk. The
+    manifest is rewritten atomically (temporary file, fsync, rename) after
+    every change, so a crash leaves either the old or the new version.
+    """
+    VERSION = 1
+
+    def __init__(self, path, settings_hash):
+        """Open the manifest at path, loading existing entries if present."""
+        self.path = path
+        self.settings_hash = settings_hash
+        self.frames = {}
+        self.load()
+
+    def load(self):
+        """Read entries from disk; a missing or unreadable manifest starts empty."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == self.VERSION:
+            self.frames = data.get("frames", {})
+
+    def save(self):
+        """Atomically replace the manifest file with the current entries."""
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "frames": self.frames}, f,
+                      indent=1, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        """Forget every entry (forces a full re-render)."""
+        self.frames = {}
+        self.save()
+
+    @staticmethod
+    def _fileValid(entry):
+        """True if the file an entry describes still has its recorded contents."""
+        path = entry.get("path")
+        try:
+            if os.path.getsize(path) != entry.get("size"):
+                return False
+            return fileChecksum(path)[0] == entry.get("sha256")
+        except (OSError, TypeError):
+            return False
+
+    def isComplete(self, frame):
+        """True if frame was rendered with the current settings and is intact."""
+        entry = self.frames.get(str(frame))
+        return (entry is not None and entry.get("settings") == self.settings_hash and
+                self._fileValid(entry))
+
+    def pendingFrames(self, frames):
+        """The frames of `frames` that still have to be rendered."""
+        return [frame for frame in frames if not self.isComplete(frame)]
+
+    def record(self, frame, path):
+        """Record a freshly written frame file and save the manifest."""
+        sha256, size = fileChecksum(path)
+        self.frames[str(frame)] = {"settings": self.settings_hash, "path": path,
+                                   "sha256": sha256, "size": size}
+        self.save()
+
+    def pendingPng(self):
+        """(frame, path) of completed frames whose PNG is missing or stale, in order."""
+        pending = []
+        for key in sorted(self.frames, key=int):
+            entry = self.frames[key]
+            if entry.get("settings") != self.settings_hash:
+                continue
+            png = entry.get("png")
+            if png is None or not self._fileValid(png):
+                pending.append((int(key), entry["path"]))
+        return pending
+
+    def recordPng(self, frame, path):
+        """Record the PNG conversion of a completed frame and save the manifest."""
+        sha256, size = fileChecksum(path)
+        self.frames[str(frame)]["png"] = {"path": path, "sha256": sha256, "size": size}
+        self.save()
@@ -1,4 +1,7 @@
 class ClosestHit:
+    __slots__ = ('hit_point', 'normal', 't', 'color', 'sphere_center',
+                 'textureType', 'shadowType')
+
     def __init__(self):
         self.hit_point = None      # Point of intersection
         self.normal = None         # Surface normal at hit point
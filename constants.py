@@ -13,8 +13,63 @@ TOTAL_FRAMES = FPS * DURATION  # 144 frames
 ANTI_ALIASING_SAMPLES = 2
 SOFT_SHADOW_SAMPLES = 2
 MAX_RAY_DEPTH = 2
+REFLECTION_CUTOFF = 1.0 / 255  # End a reflection path once its remaining weight is below one 8-bit step
 RAY_EPSILON = 0.001
 
+# Adaptive anti-aliasing (replaces the fixed ANTI_ALIASING_SAMPLES when enabled)
+ADAPTIVE_SAMPLING = False
+ADAPTIVE_MIN_SAMPLES = 2
+ADAPTIVE_MAX_SAMPLES = 16
+ADAPTIVE_TOLERANCE = 2.0     # Target standard error of the pixel mean (0-255 units)
+
+# Sample tables (pixel AA offsets and soft-shadow light jitter)
+SAMPLE_SEED = 0              # Base seed; frame n scrambles with SAMPLE_SEED + n
+SAMPLE_TABLE_SIZE = 1024     # Precomputed low-discrepancy points per table
+SCRAMBLE_TILE_SIZE = 64      # Per-pixel scrambles repeat every this many pixels
+DIRECTION_CACHE_GRIDS = 4    # Camera states whose primary direction grids are kept
+
+# Progressive refinement (one sample per pixel per pass)
+PROGRESSIVE_MAX_SAMPLES = 16  # Sample budget per pixel
+PROGRESSIVE_TIME_BUDGET = None  # Seconds per frame; None = no time limit
+PROGRESSIVE_TOLERANCE = 0.5   # Stop once the image's RMS standard error (0-255 units) is this low
+
+# Incremental rendering (fixed camera; only regions of moving spheres and lights re-traced)
+INCREMENTAL_MARGIN = 2        # Pixels added around every dirty region
+INCREMENTAL_MAX_DIRTY = 0.6   # Dirty fraction of the frame above which it is re-traced whole
+INCREMENTAL_MIRROR_RATIO = 10.0  # Spheres this many times larger are treated as plane mirrors
+INCREMENTAL_SILHOUETTE_RAYS = 16  # Rays per shadow cone used to bound shadow footprints
+
+# Render engine selection
+RENDER_ENGINE = "Python"     # "Python" (per-ray) or "NumPy" (whole-frame arrays)
+NUMPY_BATCH_SIZE = 65536     # Rays traced per array batch by the NumPy engine
+TILE_SIZE = 32               # Tile edge in pixels for tile-parallel rendering
+
+# Acceleration structure settings
+BVH_MIN_OBJECTS = 16         # Scenes with fewer spheres are scanned linearly
+BVH_LEAF_SIZE = 4            # Maximum spheres per BVH leaf
+CULL_CELL_SIZE = 8           # Screen cell edge in pixels for primary-ray culling
+
+# Frame output settings
+FRAME_FORMAT = "P3"          # "P3" (ASCII PPM), "P6" (binary PPM) or "PNG"
+DURABLE_WRITES = False       # fsync every frame file before closing it
+PIPELINE_QUEUE_SIZE = 4      # Frames buffered between pipeline stages
+MANIFEST_NAME = "manifest.json"  # Completed-frame record kept in the frame directory
+TIMELINE_NAME = "timeline.bin"  # Baked animation state of a job, see timeline.py
+
+# Benchmark settings (benchmark.py)
+BENCHMARK_SCENE_TIMES = (0.0, 0.5, 0.9)  # Animation times of the fixed benchmark scenes
+BENCHMARK_SEED = 1234        # Seed for the generated vector operands
+BENCHMARK_PIXEL_STRIDE = 8   # Benchmark primary rays start every this many pixels
+BENCHMARK_FRAME_SCALES = (0.25, 0.5, 1.0)  # Frame benchmark sizes, fraction of each side
+BENCHMARK_MIN_TIME = 0.2     # Seconds each timed run lasts at least
+BENCHMARK_REPEAT = 5         # Timed runs per benchmark; the best is reported
+BENCHMARK_BVH_SIZES = (1000, 10000, 50000)  # Sphere counts of the synthetic BVH scenes
+
+# Render farm settings (farm.py)
+FARM_LEASE_SECONDS = 120.0   # A lease expires after this long without a worker heartbeat
+FARM_HEARTBEAT_INTERVAL = 5.0  # Seconds between heartbeats of a rendering worker
+FARM_POLL_INTERVAL = 0.2     # Seconds between spool directory scans
+
 # Camera settings
 CAMERA_FOV = 60.0
 CAMERA_ASPECT = IMAGE_WIDTH / IMAGE_HEIGHT
@@ -51,6 +106,12 @@ PHASE_3_END = 1.0
 # Texture settings
 STRIPE_FREQUENCY = 8.0      # Controls density of stripes
 CHECKERBOARD_SCALE = 4.0    # Controls size of checkerboard squares
+STRIPE_SHIMMER_COLOR = Vector3d(1.0, 0.95, 0.8)  # Stripe highlight (read-only)
+CHECKER_COLOR_EVEN = Vector3d(1.0, 1.0, 0.9)     # Warm white squares (read-only)
+CHECKER_COLOR_ODD = Vector3d(0.8, 0.8, 1.0)      # Cool white squares (read-only)
+STRIPE_TABLE_WIDTH = 256     # Baked stripe texels around the sphere (angle)
+STRIPE_TABLE_HEIGHT = 128    # Baked stripe texels from pole to pole (height)
+STRIPE_TABLE_SUPERSAMPLE = 2  # Analytic samples per texel edge when baking
 
 # Bezier curve control points (main red ornament)
 P0 = Vector3d(-2, 0, -2)
@@ -76,4 +137,11 @@ SHADOW_TYPE_SHARP = "Sharp"
 SHADOW_TYPE_SMOOTH = "Smooth"
 TEXTURE_TYPE_NONE = "None"
 TEXTURE_TYPE_STRIPE = "Stripe"
-TEXTURE_TYPE_CHECKERBOARD = "Checkerboard"
\ No newline at end of file
+TEXTURE_TYPE_CHECKERBOARD = "Checkerboard"
+RENDER_ENGINE_PYTHON = "Python"
+RENDER_ENGINE_NUMPY = "NumPy"
+FRAME_FORMAT_P3 = "P3"
+FRAME_FORMAT_P6 = "P6"
+FRAME_FORMAT_PNG = "PNG"
+FRAMEBUFFER_UINT8 = "B"
+FRAMEBUFFER_UINT16 = "H"
\ No newline at end of file
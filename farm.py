@@ -0,0 +1,353 @@
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from constants import *
+from checkpoint import FrameManifest, settingsHash
+from main import render_frame, frame_filename, format_time, FRAME_CONSTANTS
+from framewriter import getFrameWriter
+from timeline import Timeline
+
+
+def writeJson(path, data):
+    """Write JSON atomically: readers see the old file or the whole new one."""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+
+def readJson(path):
+    """Parsed JSON file, or None if it is missing or not (yet) readable."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def removeFile(path):
+    """Delete a file if it still exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class Spool:
+    """
+    Shared directory the coordinator and workers talk through; it only
+    needs to be visible to every host (e.g. an NFS mount). Every message is
+    a JSON file written atomically, so no locking is needed:
+      job.json                  frame count and render options
+      timeline.bin              animation state of every frame (see timeline.py)
+      requests/<worker>.json    a worker asking for a frame
+      leases/<worker>.json      the frame granted to a worker
+      heartbeats/<worker>.json  beat counter of a rendering worker
+      results/<lease>.json      a finished frame
+      frames/                   collected output frames and their manifest
+      staging/<worker>/         frames being written by one worker
+      stop                      all frames are done; workers exit
+    """
+    def __init__(self, path):
+        """Paths of the spool at `path`; call create() before first use."""
+        self.path = path
+        self.job = os.path.join(path, "job.json")
+        self.timeline = os.path.join(path, TIMELINE_NAME)
+        self.stop = os.path.join(path, "stop")
+        self.requests = os.path.join(path, "requests")
+        self.leases = os.path.join(path, "leases")
+        self.heartbeats = os.path.join(path, "heartbeats")
+        self.results = os.path.join(path, "results")
+        self.frames = os.path.join(path, "frames")
+        self.staging = os.path.join(path, "staging")
+
+    def create(self):
+        """Create the spool directories."""
+        for directory in (self.requests, self.leases, self.heartbeats, self.results,
+                          self.frames, self.staging):
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def messages(directory):
+        """(name, path) of the complete JSON messages in a spool directory."""
+        try:
+            names = sorted(os.listdir(directory))
+        except FileNotFoundError:
+            return []
+        return [(name[:-5], os.path.join(directory, name))
+                for name in names if name.endswith(".json")]
+
+
+class Coordinator:
+    """
+    Hands out frames of one animation to workers one lease at a time.
+    Workers pull work, so fast hosts simply take more frames. A lease
+    expires when its worker's heartbeat has not changed for lease_seconds
+    (measured on the coordinator's clock, so host clocks need not agree);
+    the frame then goes back to the front of the queue. Finished frames
+    are recorded in a FrameManifest in the output directory, so a restarted
+    coordinator skips them. If an expired worker finishes anyway, its frame
+    is accepted; renders are deterministic, so duplicates are identical.
+    """
+    def __init__(self, spool_dir, total_frames=TOTAL_FRAMES, options=None,
+                 lease_seconds=FARM_LEASE_SECONDS, poll_interval=FARM_POLL_INTERVAL):
+        """options are render_frame keyword arguments (engine, frame_format, ...)."""
+        self.spool = Spool(spool_dir)
+        self.total_frames = total_frames
+        self.options = dict(options or {})
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+
+        self.leases = {}      # Lease id -> {"frame", "worker", "seen", "beat"}
+        self.reissued = 0
+        self.manifest = None
+        self.queue = deque()
+
+    def setup(self):
+        """
+        Create the spool, bake the job's timeline, publish the job and queue
+        the frames not yet done.
+        """
+        self.spool.create()
+        removeFile(self.spool.stop)
+        Timeline.bake(self.total_frames).save(self.spool.timeline)
+        writeJson(self.spool.job, {"total_frames": self.total_frames, "options": self.options,
+                                   "lease_seconds": self.lease_seconds, "timeline": True})
+        self.manifest = FrameManifest(os.path.join(self.spool.frames, MANIFEST_NAME),
+                                      settingsHash(self.options, FRAME_CONSTANTS))
+
+        # Results that arrived while no coordinator ran still count; leases
+        # from an earlier coordinator are void
+        self.collectResults()
+        for _, path in Spool.messages(self.spool.leases):
+            removeFile(path)
+        self.queue = deque(self.manifest.pendingFrames(range(self.total_frames)))
+
+    def done(self):
+        """True once every frame is recorded in the manifest."""
+        return not self.queue and not self.leases
+
+    def collectResults(self):
+        """Record finished frames; returns how many were new."""
+        collected = 0
+        for lease_id, path in Spool.messages(self.spool.results):
+            result = readJson(path)
+            if result is None:
+                continue
+            lease = self.leases.pop(lease_id, None)
+            frame = result["frame"]
+            frame_path = os.path.join(self.spool.frames, result["filename"])
+            if not self.manifest.isComplete(frame) and os.path.exists(frame_path):
+                self.manifest.record(frame, frame_path)
+                collected += 1
+                if frame in self.queue:
+                    self.queue.remove(frame)  # A re-issued frame finished by its first worker
+            elif lease is not None and not self.manifest.isComplete(frame):
+                self.queue.appendleft(frame)  # Result without a frame file
+            removeFile(path)
+        return collected
+
+    def expireLeases(self):
+        """Re-queue frames whose workers stopped sending heartbeats."""
+        now = time.monotonic()
+        for lease_id, lease in list(self.leases.items()):
+            heartbeat = readJson(os.path.join(self.spool.heartbeats, lease["worker"] + ".json"))
+            beat = None if heartbeat is None else heartbeat.get("beat")
+            if beat != lease["beat"]:
+                lease["beat"] = beat
+                lease["seen"] = now
+            elif now - lease["seen"] > self.lease_seconds:
+                del self.leases[lease_id]
+                removeFile(os.path.join(self.spool.leases, lease["worker"] + ".json"))
+                removeFile(os.path.join(self.spool.heartbeats, lease["worker"] + ".json"))
+                if not self.manifest.isComplete(lease["frame"]):
+                    self.queue.appendleft(lease["frame"])
+                    self.reissued += 1
+
+    def grantLeases(self):
+        """Give the next queued frame to each waiting worker."""
+        for worker, path in Spool.messages(self.spool.requests):
+            if not self.queue:
+                break
+            frame = self.queue.popleft()
+            lease_id = uuid.uuid4().hex
+            heartbeat = readJson(os.path.join(self.spool.heartbeats, worker + ".json"))
+            self.leases[lease_id] = {"frame": frame, "worker": worker,
+                                     "seen": time.monotonic(),
+                                     "beat": None if heartbeat is None else heartbeat.get("beat")}
+            writeJson(os.path.join(self.spool.leases, worker + ".json"),
+                      {"lease": lease_id, "frame": frame})
+            removeFile(path)
+
+    def step(self):
+        """One scan of the spool: collect, expire, grant. Returns frames collected."""
+        collected = self.collectResults()
+        self.expireLeases()
+        self.grantLeases()
+        return collected
+
+    def run(self, on_progress=None):
+        """
+        Serve leases until every frame is done, then tell workers to stop.
+        on_progress(done, total) is called whenever frames are collected.
+        """
+        self.setup()
+        pending = len(self.queue)
+        done = 0
+        while not self.done():
+            collected = self.step()
+            if collected:
+                done += collected
+                if on_progress is not None:
+                    on_progress(done, pending)
+            else:
+                time.sleep(self.poll_interval)
+        with open(self.spool.stop, "w", encoding="utf-8"):
+            pass
+        return done
+
+
+class Worker:
+    """
+    Renders frames leased from a Coordinator through a spool directory.
+    While rendering, a background thread bumps the worker's heartbeat so the
+    lease stays alive. Frames are written to a private staging directory
+    and renamed into the shared output directory, so a worker that dies
+    mid-write never leaves a partial frame there.
+    """
+    def __init__(self, spool_dir, worker_id=None, tile_workers=1,
+                 heartbeat_interval=FARM_HEARTBEAT_INTERVAL,
+                 poll_interval=FARM_POLL_INTERVAL):
+        """worker_id defaults to host name and process id."""
+        self.spool = Spool(spool_dir)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.tile_workers = tile_workers
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.beat = 0
+        self.rendered = 0
+
+    def heartbeat(self):
+        """Bump this worker's heartbeat counter."""
+        self.beat += 1
+        writeJson(os.path.join(self.spool.heartbeats, self.worker_id + ".json"),
+                  {"beat": self.beat, "time": time.time()})
+
+    def requestLease(self):
+        """Ask for a frame and wait for the lease; None once the job is finished."""
+        lease_path = os.path.join(self.spool.leases, self.worker_id + ".json")
+        writeJson(os.path.join(self.spool.requests, self.worker_id + ".json"),
+                  {"time": time.time()})
+        while True:
+            lease = readJson(lease_path)
+            if lease is not None:
+                removeFile(lease_path)
+                return lease
+            if os.path.exists(self.spool.stop):
+                removeFile(os.path.join(self.spool.requests, self.worker_id + ".json"))
+                return None
+            time.sleep(self.poll_interval)
+
+    def renderLease(self, job, lease):
+        """Render a leased frame into the output directory and report it."""
+        total_frames = job["total_frames"]
+        options = job["options"]
+        frame = lease["frame"]
+        staging = os.path.join(self.spool.staging, self.worker_id)
+        writer = getFrameWriter(options.get("frame_format", FRAME_FORMAT))
+        filename = frame_filename(frame, total_frames, writer.extension)
+
+        stopped = threading.Event()
+
+        # Several beats per lease period, however short the coordinator's leases are
+        interval = min(self.heartbeat_interval, job["lease_seconds"] / 4)
+
+        def beat():
+            while not stopped.wait(interval):
+                self.heartbeat()
+
+        self.heartbeat()
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            render_frame(frame, total_frames, tile_workers=self.tile_workers,
+                         output_dir=staging,
+                         timeline=self.spool.timeline if job.get("timeline") else None,
+                         **options)
+        finally:
+            stopped.set()
+            thread.join()
+        os.replace(os.path.join(staging, filename), os.path.join(self.spool.frames, filename))
+        writeJson(os.path.join(self.spool.results, lease["lease"] + ".json"),
+                  {"frame": frame, "filename": filename, "worker": self.worker_id})
+        self.rendered += 1
+
+    def run(self, max_frames=None):
+        """Render leased frames until the job finishes (or max_frames are done)."""
+        while readJson(self.spool.job) is None:
+            time.sleep(self.poll_interval)
+        job = readJson(self.spool.job)
+        while max_frames is None or self.rendered < max_frames:
+            lease = self.requestLease()
+            if lease is None:
+                break
+            self.renderLease(job, lease)
+        removeFile(os.path.join(self.spool.heartbeats, self.worker_id + ".json"))
+        return self.rendered
+
+
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(
+        description="Render the animation across several hosts through a shared spool directory.")
+    parser.add_argument("role", choices=["coordinator", "worker"])
+    parser.add_argument("spool", help="spool directory shared by the coordinator and workers")
+    parser.add_argument("--frames", type=int, default=TOTAL_FRAMES,
+                        help="coordinator: number of frames in the job")
+    parser.add_argument("--engine", default=RENDER_ENGINE,
+                        choices=[RENDER_ENGINE_PYTHON, RENDER_ENGINE_NUMPY],
+                        help="coordinator: render engine used by the workers")
+    parser.add_argument("--format", dest="frame_format", default=FRAME_FORMAT,
+                        choices=[FRAME_FORMAT_P3, FRAME_FORMAT_P6, FRAME_FORMAT_PNG],
+                        help="coordinator: frame file format")
+    parser.add_argument("--adaptive", action="store_true", default=ADAPTIVE_SAMPLING,
+                        help="coordinator: variance-driven anti-aliasing")
+    parser.add_argument("--lease", type=float, default=FARM_LEASE_SECONDS, metavar="SECONDS",
+                        help="coordinator: re-issue a frame after this long without a heartbeat")
+    parser.add_argument("--tile-workers", type=int, default=1,
+                        help="worker: processes used to render each frame's tiles")
+    parser.add_argument("--worker-id", default=None,
+                        help="worker: name in the spool (default host-pid)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Run a coordinator or a worker."""
+    args = parse_args(argv)
+    start_time = time.time()
+    if args.role == "coordinator":
+        options = {"engine": args.engine, "frame_format": args.frame_format,
+                   "adaptive": args.adaptive}
+        coordinator = Coordinator(args.spool, args.frames, options, args.lease)
+
+        def progress(done, total):
+            print(f"\rFrames collected: {done}/{total}", end="")
+
+        done = coordinator.run(progress)
+        print(f"\n{done} frames collected in {coordinator.spool.frames} "
+              f"({coordinator.reissued} leases re-issued) in "
+              f"{format_time(time.time() - start_time)}")
+    else:
+        worker = Worker(args.spool, args.worker_id, args.tile_workers)
+        rendered = worker.run()
+        print(f"Worker {worker.worker_id} rendered {rendered} frames in "
+              f"{format_time(time.time() - start_time)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+from array import array
+from constants import *
+
+
+class Framebuffer:
+    """
+    Pixels of a frame (or of a tile) in one contiguous buffer.
+    Values are stored packed, channels per pixel, top row first: the layout
+    every frame format and PIL use, so the buffer is exported to them
+    without copying. Rows are addressed bottom row first like the rest of
+    the renderer (row 0 is the bottom of the image). Storage is uint8
+    (a bytearray) or uint16 (an array, e.g. sample counts).
+    """
+    def __init__(self, width=IMAGE_WIDTH, height=IMAGE_HEIGHT, channels=3,
+                 typecode=FRAMEBUFFER_UINT8, data=None):
+        """
+        Create a zeroed framebuffer, or wrap `data`, a writable buffer of
+        exactly width * height * channels values in the same layout (e.g.
+        shared memory). Wrapped data is used in place, not copied.
+        """
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.typecode = typecode
+        self.stride = width * channels
+        size = self.stride * height
+
+        if data is None:
+            if typecode == FRAMEBUFFER_UINT8:
+                data = bytearray(size)
+            elif typecode == FRAMEBUFFER_UINT16:
+                data = array(typecode, bytes(size * array(typecode).itemsize))
+            else:
+                raise ValueError(f"Unsupported framebuffer type: {typecode}")
+        self.data = data
+        if len(self.view()) != size:
+            raise ValueError(f"Framebuffer data has {len(self.view())} values, expected {size}")
+
+    def __getstate__(self):
+        """Pickle (e.g. from tile workers) with the values copied into owned storage."""
+        state = self.__dict__.copy()
+        if isinstance(self.data, memoryview):
+            state["data"] = self.copy().data
+        return state
+
+    def view(self):
+        """memoryview of all values, top row first (zero-copy buffer export)."""
+        view = memoryview(self.data)
+        if view.format != self.typecode:
+            view = view.cast("B").cast(self.typecode)
+        return view
+
+    def tobytes(self):
+        """The raw values as bytes (a copy, e.g. to send to another process)."""
+        return self.view().tobytes()
+
+    def _start(self, x, y):
+        """Index of the first value of pixel (x, y), y counted from the bottom."""
+        return (self.height - 1 - y) * self.stride + x * self.channels
+
+    def setRow(self, y, values, x0=0):
+        """Store a flat sequence of values into row y starting at pixel x0."""
+        start = self._start(x0, y)
+        if not isinstance(values, array) or values.typecode != self.typecode:
+            values = array(self.typecode, values)
+        self.view()[start:start + len(values)] = values
+
+    def paste(self, source, x0=0, y0=0):
+        """Copy another framebuffer of the same type (e.g. a tile) in at (x0, y0)."""
+        view = self.view()
+        source_view = source.view()
+        length = source.stride
+        for y in range(source.height):
+            start = self._start(x0, y0 + y)
+            source_start = source._start(0, y)
+            view[start:start + length] = source_view[source_start:source_start + length]
+
+    def copy(self):
+        """An independent framebuffer with the same contents."""
+        data = self.view()
+        data = bytearray(data) if self.typecode == FRAMEBUFFER_UINT8 else array(self.typecode, data)
+        return Framebuffer(self.width, self.height, self.channels, self.typecode, data)
@@ -0,0 +1,110 @@
+import os
+import struct
+import zlib
+from constants import *
+
+
+class FrameWriter:
+    """
+    Base class for frame output formats.
+    Subclasses encode packed top-to-bottom RGB bytes, given as any buffer
+    (e.g. Framebuffer.view(), which is not copied); durability (flush +
+    fsync before the file is closed) is opt-in because it dominates write
+    time on network filesystems.
+    """
+    extension = ""
+
+    def __init__(self, durable=DURABLE_WRITES):
+        """Create a writer; durable=True fsyncs every frame."""
+        self.durable = durable
+
+    def encode(self, width, height, rgb):
+        """Return the encoded file contents for packed RGB bytes."""
+        raise NotImplementedError
+
+    def write(self, path, width, height, rgb):
+        """Encode a frame and write it to path."""
+        self.writeEncoded(path, self.encode(width, height, rgb))
+
+    def writeEncoded(self, path, data):
+        """Write already-encoded file contents to path."""
+        with open(path, "wb") as f:
+            f.write(data)
+            if self.durable:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def replace(self, path, width, height, rgb):
+        """
+        Write a frame to a temporary file and rename it over path, so a
+        viewer polling the file never reads a half-written frame.
+        """
+        temp_path = path + ".tmp"
+        self.write(temp_path, width, height, rgb)
+        os.replace(temp_path, path)
+
+
+class PPMTextWriter(FrameWriter):
+    """ASCII PPM (P3), one text line per image row."""
+    extension = ".ppm"
+
+    def encode(self, width, height, rgb):
+        """Format every channel as decimal text."""
+        row_bytes = width * 3
+        lines = [f"P3\n{width} {height}\n255\n"]
+        for start in range(0, height * row_bytes, row_bytes):
+            lines.append(" ".join(map(str, rgb[start:start + row_bytes])) + "\n")
+        return "".join(lines).encode("ascii")
+
+
+class PPMBinaryWriter(FrameWriter):
+    """Binary PPM (P6): a short header followed by the raw RGB bytes."""
+    extension = ".ppm"
+
+    def encode(self, width, height, rgb):
+        """Prepend the P6 header to the pixel bytes."""
+        return b"".join((f"P6\n{width} {height}\n255\n".encode("ascii"), rgb))
+
+
+class PNGWriter(FrameWriter):
+    """8-bit RGB PNG encoded directly with zlib (no PIL round-trip)."""
+    extension = ".png"
+
+    def __init__(self, durable=DURABLE_WRITES, compression=6):
+        """Create a PNG writer with the given zlib compression level."""
+        super().__init__(durable)
+        self.compression = compression
+
+    @staticmethod
+    def chunk(kind, data):
+        """Build one length-prefixed, CRC-terminated PNG chunk."""
+        return (struct.pack(">I", len(data)) + kind + data +
+                struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    def encode(self, width, height, rgb):
+        """Encode unfiltered scanlines into a PNG file."""
+        row_bytes = width * 3
+        raw = bytearray()
+        for start in range(0, height * row_bytes, row_bytes):
+            raw.append(0)  # Filter type: None
+            raw += rgb[start:start + row_bytes]
+
+        header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+        return (b"\x89PNG\r\n\x1a\n" +
+                self.chunk(b"IHDR", header) +
+                self.chunk(b"IDAT", zlib.compress(bytes(raw), self.compression)) +
+                self.chunk(b"IEND", b""))
+
+
+FRAME_WRITERS = {
+    FRAME_FORMAT_P3: PPMTextWriter,
+    FRAME_FORMAT_P6: PPMBinaryWriter,
+    FRAME_FORMAT_PNG: PNGWriter,
+}
+
+
+def getFrameWriter(frame_format=FRAME_FORMAT, durable=DURABLE_WRITES):
+    """Return a writer instance for a FRAME_FORMAT_* constant."""
+    if frame_format not in FRAME_WRITERS:
+        raise ValueError(f"Unknown frame format: {frame_format}")
+    return FRAME_WRITERS[frame_format](durable=durable)
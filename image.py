@@ -1,21 +1,54 @@
 import time
 import os
-import random
 import math
+from array import array
+from contextlib import nullcontext
 from constants import *
 from vector3d import Vector3d
 from ray import Ray
 from sphere import Sphere
 from closesthit import ClosestHit
 from light import Light
+from scenestore import SceneStore
+from bvh import BVH
+from sampler import Sampler
+from screencull import ScreenCuller
+from texture import STRIPE_STRENGTH, getStripeTable, checkerColor
+from tilerender import renderTiled
+from renderstats import RenderStats
+from framewriter import getFrameWriter
+from framebuffer import Framebuffer
 
 class Image:
-    def __init__(self, camera):
-        """Initialize renderer with camera."""
+    def __init__(self, camera, seed=SAMPLE_SEED, stats=False):
+        """
+        Initialize renderer with camera; seed scrambles the sample tables.
+        stats collects a RenderStats of the work done by later renders.
+        """
         self.camera = camera
-        self.pixels = []
+        self.sampler = Sampler(seed)
+        self.pixels = None  # Framebuffer of the last render
+        self.sample_counts = None  # Samples taken per pixel, one-channel uint16 Framebuffer
         self.scene_objects = []
+        self.scene = SceneStore()
+        self.accelerator = self.scene  # Answers closest/any-hit queries for the scene
         self.lights = []
+        self.hit_records = []  # One reusable ClosestHit per ray depth
+        self.occluder_cache = {}  # Light -> index of the sphere that last blocked it
+        self.culler = None  # ScreenCuller for primary rays, see primaryCuller()
+        self.stats = RenderStats() if stats else None
+
+    def timed(self, stage):
+        """Context manager timing a render stage into self.stats (no-op when disabled)."""
+        if self.stats is None:
+            return nullcontext()
+        return self.stats.timed(stage)
+
+    def instrumented(self):
+        """Context manager counting Python-engine work into self.stats (no-op when disabled)."""
+        if self.stats is None:
+            return nullcontext()
+        return self.stats.instrument(self)
 
     def easeInOutSine(self, t):
         """Smooth easing function for animations."""
@@ -29,17 +62,14 @@ class Image:
                 P2 * 3*t**2*(1-t) + 
                 P3 * t**3)
 
-    def createAnimatedScene(self, t):
-        """Create scene with three animated spheres."""
-        self.scene_objects = []
-        
+    def animatedPositions(self, t):
+        """
+        Positions of everything that moves at animation time t: the centers
+        of the three ornaments and the positions of the two lights.
+        """
         # 1. Main red ornament (largest) - Bezier curve motion
         pos = self.bezierPoint(t, P0, P1, P2, P3)
         pos.y += math.sin(t * math.pi * 2) * BOUNCE_AMOUNT
-        self.scene_objects.append(
-            Sphere(pos, 0.5, CHRISTMAS_RED,
-                  TEXTURE_TYPE_STRIPE, SHADOW_TYPE_SMOOTH)
-        )
         
         # 2. Gold ornament (medium) - Circular orbital motion
         angle = t * CIRCLE_ORBIT_SPEED * math.pi * 2
@@ -49,97 +79,144 @@ class Image:
             CIRCLE_HEIGHT + math.sin(t * CIRCLE_VERTICAL_SPEED * math.pi) * BOUNCE_AMOUNT,
             math.sin(angle) * orbit_radius - 2
         )
-        self.scene_objects.append(
-            Sphere(circle_pos, 0.3, GOLD,
-                  TEXTURE_TYPE_STRIPE, SHADOW_TYPE_SMOOTH)
-        )
         
         # 3. Silver ornament (smallest) - Second Bezier curve
         pos2 = self.bezierPoint(t, P0_2, P1_2, P2_2, P3_2)
         pos2.y += math.cos(t * math.pi * 3) * BOUNCE_AMOUNT * 0.5
-        self.scene_objects.append(
-            Sphere(pos2, 0.25, SILVER,
-                  TEXTURE_TYPE_STRIPE, SHADOW_TYPE_SMOOTH)
-        )
-        
-        # Ground sphere (stage)
-        self.scene_objects.append(
-            Sphere(Vector3d(0, -100.5, 0), 100.0, WHITE,
-                  TEXTURE_TYPE_CHECKERBOARD, SHADOW_TYPE_SHARP)
-        )
         
-        # Animate lights
+        # Lights circle the stage in opposite phase
         angle = t * math.pi * 2
         light_radius = 8.0
         height_offset = math.sin(t * math.pi * 2) * 2.0
+        lights = [
+            Vector3d(math.cos(angle) * light_radius,
+                     8 + height_offset,
+                     math.sin(angle) * light_radius),
+            Vector3d(math.cos(angle + math.pi) * light_radius,
+                     6 - height_offset,
+                     math.sin(angle + math.pi) * light_radius)
+        ]
+        return [pos, circle_pos, pos2], lights
+
+    def createAnimatedScene(self, t):
+        """Create scene with three animated spheres."""
+        self.buildScene(*self.animatedPositions(t))
+
+    def buildScene(self, centers, light_positions):
+        """
+        Create the ornaments at `centers` (red, gold, silver), the stage and
+        the two lights at `light_positions`; see animatedPositions.
+        """
+        red, gold, silver = centers
+        self.scene_objects = [
+            Sphere(red, 0.5, CHRISTMAS_RED,
+                   TEXTURE_TYPE_STRIPE, SHADOW_TYPE_SMOOTH),
+            Sphere(gold, 0.3, GOLD,
+                   TEXTURE_TYPE_STRIPE, SHADOW_TYPE_SMOOTH),
+            Sphere(silver, 0.25, SILVER,
+                   TEXTURE_TYPE_STRIPE, SHADOW_TYPE_SMOOTH),
+            # Ground sphere (stage)
+            Sphere(Vector3d(0, -100.5, 0), 100.0, WHITE,
+                   TEXTURE_TYPE_CHECKERBOARD, SHADOW_TYPE_SHARP)
+        ]
+        
+        # Pack the spheres into the structure-of-arrays store
+        self.scene = SceneStore(self.scene_objects)
+        self.accelerator = self.buildAccelerator()
+        self.occluder_cache = {}
         
+        warm, cool = light_positions
         self.lights = [
-            Light(Vector3d(math.cos(angle) * light_radius,
-                         8 + height_offset,
-                         math.sin(angle) * light_radius),
+            Light(warm,
                  AMBIENT_INTENSITY * 0.5,
                  DIFFUSE_INTENSITY,
                  SPECULAR_INTENSITY,
                  WARM_GOLD_LIGHT),
             
-            Light(Vector3d(math.cos(angle + math.pi) * light_radius,
-                         6 - height_offset,
-                         math.sin(angle + math.pi) * light_radius),
+            Light(cool,
                  AMBIENT_INTENSITY * 0.3,
                  DIFFUSE_INTENSITY * 0.6,
                  SPECULAR_INTENSITY * 0.8,
                  COOL_SILVER_LIGHT)
         ]
 
+    def primaryCuller(self):
+        """
+        Screen-space culler for primary rays, rebuilt when the camera or scene
+        changed. None when a BVH is in use, since the BVH already prunes.
+        """
+        if self.accelerator is not self.scene:
+            return None
+        culler = self.culler
+        if (culler is None or culler.scene is not self.scene or
+                culler.key != ScreenCuller.cameraKey(self.camera)):
+            self.culler = culler = ScreenCuller(self.camera, self.scene)
+        return culler
+
+    def buildAccelerator(self):
+        """BVH over the scene store; small scenes are cheaper to scan linearly."""
+        if len(self.scene) >= BVH_MIN_OBJECTS:
+            return BVH(self.scene)
+        return self.scene
+
     def rayHitsSphere(self, ray, sphere, hit_record):
         """Check ray-sphere intersection and update hit record."""
         hit, t = sphere.rayIntersect(ray)
         
         if hit and t < hit_record.t:
-            hit_point = ray.getPointAtParameter(t)
-            normal = sphere.getNormalAt(hit_point)
-            
-            hit_record.update(
-                t=t,
-                hit_point=hit_point,
-                normal=normal,
-                color=sphere.getColor(),
-                sphere_center=sphere.getCenter(),
-                textureType=sphere.getTextureType(),
-                shadowType=sphere.getShadowType()
-            )
+            self.recordHit(ray, sphere, t, hit_record)
             return True
         return False
 
-    def generateStripeTexture(self, hit_point, base_color, sphere_center):
-        """Generate shimmering stripe texture."""
-        stripe_color = Vector3d(1.0, 0.95, 0.8)  # Warm golden shimmer
-        
-        local_point = (hit_point - sphere_center).normalize()
-        angle = math.atan2(local_point.z, local_point.x)
-        height = local_point.y
+    def recordHit(self, ray, sphere, t, hit_record):
+        """Fill hit record for a ray hitting sphere at parameter t."""
+        hit_point = ray.getPointAtParameter(t)
+        normal = sphere.getNormalAt(hit_point)
         
-        pattern = (math.sin(height * STRIPE_FREQUENCY + angle * 4) + 
-                  math.sin(height * 12 - angle * 6) * 0.5)
+        hit_record.update(
+            t=t,
+            hit_point=hit_point,
+            normal=normal,
+            color=sphere.getColor(),
+            sphere_center=sphere.getCenter(),
+            textureType=sphere.getTextureType(),
+            shadowType=sphere.getShadowType()
+        )
+
+    def getHitRecord(self, depth):
+        """Return the cleared, reusable hit record for a ray depth."""
+        while len(self.hit_records) <= depth:
+            self.hit_records.append(ClosestHit())
+        hit_record = self.hit_records[depth]
+        hit_record.reset()
+        return hit_record
+
+    def generateStripeTexture(self, hit_point, base_color, sphere_center):
+        """Generate shimmering stripe texture from the baked stripe table."""
+        # atan2 ignores scale, so only the height needs the normalized point
+        x = hit_point.x - sphere_center.x
+        y = hit_point.y - sphere_center.y
+        z = hit_point.z - sphere_center.z
+        height = y / math.sqrt(x * x + y * y + z * z)
+        blend = getStripeTable().lookup(math.atan2(z, x), height) * STRIPE_STRENGTH
         
-        blend = (math.sin(pattern * math.pi) + 1) * 0.5
-        return base_color * (1 - blend * 0.3) + stripe_color * (blend * 0.3)
+        keep = 1 - blend
+        stripe_color = STRIPE_SHIMMER_COLOR
+        return Vector3d(base_color.x * keep + stripe_color.x * blend,
+                        base_color.y * keep + stripe_color.y * blend,
+                        base_color.z * keep + stripe_color.z * blend)
 
     def generateCheckTexture(self, hit_point):
-        """Generate checkerboard texture for stage."""
-        scale = CHECKERBOARD_SCALE
-        x = int(hit_point.x * scale)
-        z = int(hit_point.z * scale)
-        
-        if (x + z) % 2 == 0:
-            return Vector3d(1.0, 1.0, 0.9)  # Warm white
-        return Vector3d(0.8, 0.8, 1.0)      # Cool white
+        """Generate checkerboard texture for stage (shared read-only colors)."""
+        return checkerColor(hit_point.x, hit_point.z)
 
     def calcBlinnPhongShading(self, ray, hit_record, light):
         """Calculate Blinn-Phong shading."""
-        light_dir = (light.getPosition() - hit_record.hit_point).normalize()
-        view_dir = (ray.getOrigin() - hit_record.hit_point).normalize()
-        half_vector = (light_dir + view_dir).normalize()
+        light_dir = (light.getPosition() - hit_record.hit_point).normalizeInPlace()
+        # The view direction is turned into the half vector in place
+        half_vector = (ray.getOrigin() - hit_record.hit_point).normalizeInPlace()
+        half_vector += light_dir
+        half_vector.normalizeInPlace()
         
         diff = max(0.0, hit_record.normal.dot(light_dir))
         spec = max(0.0, hit_record.normal.dot(half_vector)) ** SPECULAR_POWER
@@ -149,30 +226,31 @@ class Image:
     def calcShadows(self, hit_record, light):
         """Calculate shadows with smooth transitions."""
         shadow_hits = 0
-        num_samples = SOFT_SHADOW_SAMPLES if hit_record.shadowType == SHADOW_TYPE_SMOOTH else 1
+        smooth = hit_record.shadowType == SHADOW_TYPE_SMOOTH
+        num_samples = SOFT_SHADOW_SAMPLES if smooth else 1
+
+        # Origin and direction are shared scratch vectors for all samples. The
+        # direction is left unnormalized so the light sits at t = 1 and only
+        # spheres in between count as occluders.
+        light_pos = light.getPosition()
+        shadow_origin = hit_record.hit_point.copy().addScaled(hit_record.normal, RAY_EPSILON)
+        shadow_dir = Vector3d(0, 0, 0)
 
-        for _ in range(num_samples):
-            light_pos = light.getPosition()
+        for sample in range(num_samples):
+            shadow_dir.set(light_pos.x - shadow_origin.x,
+                           light_pos.y - shadow_origin.y,
+                           light_pos.z - shadow_origin.z)
             
-            if hit_record.shadowType == SHADOW_TYPE_SMOOTH:
-                jitter_range = 0.5
-                light_pos = light_pos + Vector3d(
-                    random.uniform(-jitter_range, jitter_range),
-                    random.uniform(-jitter_range, jitter_range),
-                    random.uniform(-jitter_range, jitter_range)
-                )
+            if smooth:
+                jx, jy, jz = self.sampler.lightJitter(sample, 0.5)
+                shadow_dir.x += jx
+                shadow_dir.y += jy
+                shadow_dir.z += jz
 
-            shadow_origin = hit_record.hit_point + hit_record.normal * RAY_EPSILON
-            shadow_dir = (light_pos - shadow_origin).normalize()
-            shadow_ray = Ray(shadow_origin, shadow_dir)
-
-            for obj in self.scene_objects:
-                hit, _ = obj.rayIntersect(shadow_ray)
-                if hit:
-                    shadow_hits += 1
-                    if hit_record.shadowType == SHADOW_TYPE_SHARP:
-                        return 0.95
-                    break
+            if self.isOccluded(light, shadow_origin, shadow_dir):
+                shadow_hits += 1
+                if hit_record.shadowType == SHADOW_TYPE_SHARP:
+                    return 0.95
 
         if hit_record.shadowType == SHADOW_TYPE_SMOOTH:
             shadow_factor = (shadow_hits / num_samples)
@@ -180,20 +258,85 @@ class Image:
         
         return 0.0
 
-    def calculatePixelColor(self, ray, depth=MAX_RAY_DEPTH):
-        """Calculate final pixel color with reflection and lighting."""
-        if depth <= 0:
-            return BACKGROUND_COLOR_BOTTOM
-            
-        hit_record = ClosestHit()
-        has_hit = False
+    def isOccluded(self, light, origin, direction):
+        """
+        Bounded occlusion test for a shadow ray ending at t = 1.
+        The sphere that last blocked this light is tested first, since
+        neighbouring pixels usually share the same blocker.
+        """
+        ox, oy, oz = origin.x, origin.y, origin.z
+        dx, dy, dz = direction.x, direction.y, direction.z
         
-        for obj in self.scene_objects:
-            if self.rayHitsSphere(ray, obj, hit_record):
-                has_hit = True
-                
-        if has_hit:
-            base_color = Vector3d(*hit_record.color) / 255.0
+        cached = self.occluder_cache.get(light, -1)
+        if cached >= 0 and self.accelerator.hitsSphereRaw(cached, ox, oy, oz, dx, dy, dz, 1.0):
+            return True
+        
+        index = self.accelerator.occluderRaw(ox, oy, oz, dx, dy, dz, 1.0)
+        if index >= 0:
+            self.occluder_cache[light] = index
+            return True
+        return False
+
+    def reflectedRay(self, ray, hit_record):
+        """Mirror reflection of ray at hit_record, nudged off the surface."""
+        normal = hit_record.normal
+        reflect_dir = ray.direction.copy().addScaled(normal, -2 * ray.direction.dot(normal))
+        return Ray(hit_record.hit_point.copy().addScaled(normal, RAY_EPSILON), reflect_dir)
+
+    def calculatePixelColor(self, ray, depth=MAX_RAY_DEPTH, candidates=None):
+        """Calculate final pixel color as 8-bit (r, g, b); see traceColor."""
+        r, g, b = self.traceColor(ray, depth, candidates)
+        return (min(255, max(0, int(r))),
+                min(255, max(0, int(g))),
+                min(255, max(0, int(b))))
+
+    def traceColor(self, ray, depth=MAX_RAY_DEPTH, candidates=None):
+        """
+        Calculate pixel color with reflection and lighting as unquantized
+        floats in 0-255 units (not clamped).
+        Reflections are followed in a loop carrying the path's throughput (the
+        weight left for later bounces); the path ends after depth bounces or
+        once the throughput drops below REFLECTION_CUTOFF.
+        candidates limits a primary ray to the spheres its screen cell can see.
+        """
+        r = g = b = 0.0
+        throughput = 1.0
+        
+        while True:
+            if depth <= 0:
+                scale = throughput / 255.0
+                bottom = BACKGROUND_COLOR_BOTTOM
+                r += bottom[0] * scale
+                g += bottom[1] * scale
+                b += bottom[2] * scale
+                break
+            
+            hit_record = self.getHitRecord(depth)
+            if candidates is None:
+                index, t = self.accelerator.closestHit(ray)
+            elif candidates:
+                origin = ray.origin
+                direction = ray.direction
+                index, t = self.scene.closestHitAmong(candidates, origin.x, origin.y, origin.z,
+                                                      direction.x, direction.y, direction.z)
+            else:
+                index = -1
+            
+            if index < 0:
+                # Background gradient
+                direction = ray.direction
+                t = 0.5 * (direction.y / direction.length() + 1.0)
+                bottom = BACKGROUND_COLOR_BOTTOM
+                top = BACKGROUND_COLOR_TOP
+                scale = throughput / 255.0
+                r += ((1.0 - t) * bottom[0] + t * top[0]) * scale
+                g += ((1.0 - t) * bottom[1] + t * top[1]) * scale
+                b += ((1.0 - t) * bottom[2] + t * top[2]) * scale
+                break
+            
+            self.recordHit(ray, self.scene.spheres[index], t, hit_record)
+            color = hit_record.color
+            base_color = Vector3d(color[0] / 255.0, color[1] / 255.0, color[2] / 255.0)
             
             if hit_record.textureType == TEXTURE_TYPE_STRIPE:
                 base_color = self.generateStripeTexture(
@@ -204,89 +347,289 @@ class Image:
             elif hit_record.textureType == TEXTURE_TYPE_CHECKERBOARD:
                 base_color = self.generateCheckTexture(hit_record.hit_point)
             
-            reflectivity = 0.5 if hit_record.color == GOLD else 0.3
-            reflected_color = Vector3d(0, 0, 0)
-            
-            if reflectivity > 0 and depth > 0:
-                reflect_dir = ray.reflect(hit_record.normal)
-                reflect_ray = Ray(hit_record.hit_point + hit_record.normal * RAY_EPSILON,
-                                reflect_dir)
-                reflected_color = Vector3d(*self.calculatePixelColor(reflect_ray, depth-1)) / 255.0
-            
             lit_color = Vector3d(0, 0, 0)
             for light in self.lights:
                 diffuse_specular = self.calcBlinnPhongShading(ray, hit_record, light)
                 shadow = self.calcShadows(hit_record, light)
                 
-                light_color = light.getColor()
                 shadow_factor = 1.0 - shadow
-                lit_color += ((base_color * diffuse_specular * shadow_factor) * 
-                            light_color)
+                lit_color.mulAdd(base_color, light.getColor(), diffuse_specular * shadow_factor)
             
-            final_color = lit_color * (1 - reflectivity) + reflected_color * reflectivity
+            # The surface keeps 1 - reflectivity of the path; the rest is reflected
+            reflectivity = 0.5 if hit_record.color == GOLD else 0.3
+            keep = throughput * (1 - reflectivity)
+            r += lit_color.x * keep
+            g += lit_color.y * keep
+            b += lit_color.z * keep
             
-            return (min(255, max(0, int(final_color.x * 255))),
-                   min(255, max(0, int(final_color.y * 255))),
-                   min(255, max(0, int(final_color.z * 255))))
+            throughput *= reflectivity
+            depth -= 1
+            if throughput < REFLECTION_CUTOFF:
+                break
+            if depth > 0:
+                ray = self.reflectedRay(ray, hit_record)
+                candidates = None
         
-        # Background gradient
-        t = 0.5 * (ray.direction.normalize().y + 1.0)
-        color = ((1.0 - t) * Vector3d(*BACKGROUND_COLOR_BOTTOM) + 
-                t * Vector3d(*BACKGROUND_COLOR_TOP))
-        return (int(color.x), int(color.y), int(color.z))
-
-    def renderFrame(self, filename):
-        """Render a single frame and save to file with error checking."""
-        try:
-            self.pixels = []
+        return r * 255, g * 255, b * 255
+
+    def primaryRay(self, col, row, sample, direction=None):
+        """
+        Start AA sample `sample` of pixel (col, row) and return its primary
+        ray. direction is its (x, y, z) unit direction when the caller
+        prefetched it with a row of others (see primaryDirectionRows);
+        otherwise just this one direction is computed.
+        """
+        self.sampler.beginSample(col, row, sample)
+        if direction is None:
+            direction = self.camera.primaryDirection(self.sampler, sample, col, row)
+        return Ray.fromUnit(self.camera.origin, Vector3d(direction[0], direction[1],
+                                                         direction[2]))
+
+    def primaryDirectionRows(self, row, samples, x0=0, x1=IMAGE_WIDTH):
+        """
+        Camera directions of columns x0 .. x1 - 1 of pixel row `row` for AA
+        samples 0 .. samples - 1, one flat x, y, z array per sample.
+        """
+        return [self.camera.primaryDirections(self.sampler, sample, row, x0=x0, x1=x1)
+                for sample in range(samples)]
+
+    def samplePixel(self, col, row, candidates=None, directions=None):
+        """
+        Average ANTI_ALIASING_SAMPLES jittered samples; returns (color, samples).
+        candidates are the spheres the pixel's primary rays can hit (None = all);
+        directions are optional prefetched (x, y, z) primary directions of the
+        pixel's first samples (see primaryRay).
+        """
+        pixel_color = Vector3d(0, 0, 0)
+        
+        for sample in range(ANTI_ALIASING_SAMPLES):
+            direction = directions[sample] if directions and sample < len(directions) else None
+            ray = self.primaryRay(col, row, sample, direction)
+            color = self.calculatePixelColor(ray, MAX_RAY_DEPTH, candidates)
+            pixel_color.x += color[0]
+            pixel_color.y += color[1]
+            pixel_color.z += color[2]
+        
+        pixel_color *= 1.0 / ANTI_ALIASING_SAMPLES
+        return pixel_color, ANTI_ALIASING_SAMPLES
+
+    def samplePixelAdaptive(self, col, row, candidates=None, directions=None):
+        """
+        Sample until the running mean converges; returns (color, samples).
+        Takes ADAPTIVE_MIN_SAMPLES, then keeps going while the standard error
+        of the worst channel (0-255 units) exceeds ADAPTIVE_TOLERANCE, up to
+        ADAPTIVE_MAX_SAMPLES. Samples beyond the prefetched directions get
+        a single direction computed from the camera.
+        """
+        mean = Vector3d(0, 0, 0)
+        m2 = Vector3d(0, 0, 0)  # Welford sum of squared deviations
+        n = 0
+        
+        while n < ADAPTIVE_MAX_SAMPLES:
+            direction = directions[n] if directions and n < len(directions) else None
+            color = self.calculatePixelColor(self.primaryRay(col, row, n, direction),
+                                             MAX_RAY_DEPTH, candidates)
+            n += 1
+            
+            dr = color[0] - mean.x
+            dg = color[1] - mean.y
+            db = color[2] - mean.z
+            mean.x += dr / n
+            mean.y += dg / n
+            mean.z += db / n
+            m2.x += dr * (color[0] - mean.x)
+            m2.y += dg * (color[1] - mean.y)
+            m2.z += db * (color[2] - mean.z)
+            
+            if n >= ADAPTIVE_MIN_SAMPLES:
+                variance = max(m2.x, m2.y, m2.z) / max(n - 1, 1)
+                if math.sqrt(variance / n) <= ADAPTIVE_TOLERANCE:
+                    break
+        
+        return mean, n
+
+    def tracePixels(self, x0=0, y0=0, x1=IMAGE_WIDTH, y1=IMAGE_HEIGHT, adaptive=False):
+        """
+        Trace pixels of the region [x0, x1) x [y0, y1) with the per-ray Python
+        engine. Returns (pixels, sample_counts) as region-sized Framebuffers.
+        """
+        sample = self.samplePixelAdaptive if adaptive else self.samplePixel
+        prefetch = ADAPTIVE_MIN_SAMPLES if adaptive else ANTI_ALIASING_SAMPLES
+        culler = self.primaryCuller()
+        pixels = Framebuffer(x1 - x0, y1 - y0)
+        sample_counts = Framebuffer(x1 - x0, y1 - y0, 1, FRAMEBUFFER_UINT16)
+        for row in range(y0, y1):
+            row_pixels = []
+            row_counts = []
+            direction_rows = self.primaryDirectionRows(row, prefetch, x0, x1)
+            for col in range(x0, x1):
+                candidates = culler.candidatesAt(col, row) if culler else None
+                i = (col - x0) * 3
+                directions = [row_directions[i:i + 3] for row_directions in direction_rows]
+                pixel_color, samples = sample(col, row, candidates, directions)
+                row_pixels += (
+                    int(max(0, min(255, pixel_color.x))),
+                    int(max(0, min(255, pixel_color.y))),
+                    int(max(0, min(255, pixel_color.z)))
+                )
+                row_counts.append(samples)
             
+            pixels.setRow(row - y0, row_pixels)
+            sample_counts.setRow(row - y0, row_counts)
+        return pixels, sample_counts
+
+    def tracePixelsNumpy(self, x0=0, y0=0, x1=IMAGE_WIDTH, y1=IMAGE_HEIGHT, adaptive=False):
+        """Trace pixels of the region [x0, x1) x [y0, y1) with the NumPy engine."""
+        from numpyrenderer import NumpyRenderer
+        return NumpyRenderer(self).renderPixels(x0, y0, x1, y1, adaptive)
+
+    def traceRegion(self, engine, x0=0, y0=0, x1=IMAGE_WIDTH, y1=IMAGE_HEIGHT, adaptive=False):
+        """
+        Trace a pixel region with the selected render engine.
+        Returns (pixels, sample_counts) as region-sized Framebuffers.
+        """
+        self.occluder_cache = {}  # Occluder hints are per tile
+        if engine == RENDER_ENGINE_NUMPY:
+            return self.tracePixelsNumpy(x0, y0, x1, y1, adaptive)
+        if engine == RENDER_ENGINE_PYTHON:
+            with self.instrumented():
+                return self.tracePixels(x0, y0, x1, y1, adaptive)
+        raise ValueError(f"Unknown render engine: {engine}")
+
+    def renderPixels(self, engine=RENDER_ENGINE, workers=1, tile_size=TILE_SIZE,
+                     adaptive=ADAPTIVE_SAMPLING):
+        """
+        Fill self.pixels (and self.sample_counts) for the whole frame without
+        writing a file and return the pixel Framebuffer. With workers > 1 the
+        frame is split into tiles rendered in parallel; adaptive enables
+        variance-driven AA.
+        """
+        with self.timed("trace"):
+            if workers > 1:
+                self.pixels, self.sample_counts = renderTiled(self, engine, workers,
+                                                              tile_size, adaptive)
+            else:
+                self.pixels, self.sample_counts = self.traceRegion(engine, adaptive=adaptive)
+        return self.pixels
+
+    def sampleCountPixels(self):
+        """Sample counts as a grayscale debug Framebuffer (white = ADAPTIVE_MAX_SAMPLES)."""
+        scale = 255.0 / max(ADAPTIVE_MAX_SAMPLES, ANTI_ALIASING_SAMPLES)
+        levels = bytes(min(255, int(count * scale)) for count in self.sample_counts.view())
+        counts = self.sample_counts
+        pixels = Framebuffer(counts.width, counts.height)
+        for channel in range(3):
+            pixels.data[channel::3] = levels
+        return pixels
+
+    def writeSampleCounts(self, filename, writer=None, output_dir="frames_samples"):
+        """Write the per-pixel sample counts of the last render as an image."""
+        os.makedirs(output_dir, exist_ok=True)
+        if writer is None:
+            writer = getFrameWriter()
+        writer.write(os.path.join(output_dir, filename), IMAGE_WIDTH, IMAGE_HEIGHT,
+                     self.sampleCountPixels().view())
+
+    def renderFrame(self, filename, engine=RENDER_ENGINE, workers=1, tile_size=TILE_SIZE,
+                    writer=None, output_dir="frames", adaptive=ADAPTIVE_SAMPLING):
+        """
+        Render a single frame and save to file with error checking.
+        With workers > 1 the frame is split into tiles rendered in parallel.
+        writer is a framewriter.FrameWriter; defaults to FRAME_FORMAT.
+        """
+        try:
             # Create pixel data
-            for row in range(IMAGE_HEIGHT):
-                row_pixels = []
-                for col in range(IMAGE_WIDTH):
-                    pixel_color = Vector3d(0, 0, 0)
-                    
-                    for _ in range(ANTI_ALIASING_SAMPLES):
-                        u = (col + random.random()) / (IMAGE_WIDTH - 1)
-                        v = (row + random.random()) / (IMAGE_HEIGHT - 1)
-                        ray = self.camera.getARay(u, v)
-                        color = self.calculatePixelColor(ray)
-                        pixel_color += Vector3d(*color)
-                    
-                    pixel_color = pixel_color / ANTI_ALIASING_SAMPLES
-                    row_pixels.append((
-                        int(max(0, min(255, pixel_color.x))),
-                        int(max(0, min(255, pixel_color.y))),
-                        int(max(0, min(255, pixel_color.z)))
-                    ))
-                
-                self.pixels.append(row_pixels)
+            self.renderPixels(engine, workers, tile_size, adaptive)
             
             # Ensure output directory exists
-            os.makedirs("frames", exist_ok=True)
-            file_path = os.path.join("frames", filename)
+            os.makedirs(output_dir, exist_ok=True)
+            file_path = os.path.join(output_dir, filename)
             
-            # Write PPM file with strict format
-            with open(file_path, "w") as f:
-                # Write PPM header
-                f.write("P3\n")
-                f.write(f"{IMAGE_WIDTH} {IMAGE_HEIGHT}\n")
-                f.write("255\n")
-                
-                # Write pixel data with careful formatting
-                for row in reversed(self.pixels):
-                    row_data = []
-                    for r, g, b in row:
-                        r = max(0, min(255, r))
-                        g = max(0, min(255, g))
-                        b = max(0, min(255, b))
-                        row_data.extend([str(r), str(g), str(b)])
-                    f.write(" ".join(row_data) + "\n")
-                
-                # Ensure file is properly written
-                f.flush()
-                os.fsync(f.fileno())
+            if writer is None:
+                writer = getFrameWriter()
+            with self.timed("write"):
+                writer.write(file_path, IMAGE_WIDTH, IMAGE_HEIGHT, self.pixels.view())
                 
         except Exception as e:
             print(f"Error in renderFrame for {filename}: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def tracePass(self, engine=RENDER_ENGINE, sample=0, renderer=None):
+        """
+        Trace AA sample `sample` of every pixel without averaging or
+        quantizing: colors are floats clamped to 0-255, so only the
+        accumulated frame is rounded when it is written. Returns a flat
+        r, g, b sequence, bottom row first.
+        renderer is a NumpyRenderer reused across passes of the NumPy engine.
+        """
+        self.occluder_cache = {}
+        if engine == RENDER_ENGINE_NUMPY:
+            from numpyrenderer import NumpyRenderer
+            renderer = renderer or NumpyRenderer(self)
+            return renderer.tracePass(sample).ravel().tolist()
+        if engine != RENDER_ENGINE_PYTHON:
+            raise ValueError(f"Unknown render engine: {engine}")
+        
+        culler = self.primaryCuller()
+        colors = []
+        with self.instrumented():
+            for row in range(IMAGE_HEIGHT):
+                directions = self.camera.primaryDirections(self.sampler, sample, row)
+                for col in range(IMAGE_WIDTH):
+                    candidates = culler.candidatesAt(col, row) if culler else None
+                    i = col * 3
+                    color = self.traceColor(self.primaryRay(col, row, sample,
+                                                            directions[i:i + 3]),
+                                            MAX_RAY_DEPTH, candidates)
+                    colors.extend(min(255.0, max(0.0, channel)) for channel in color)
+        return colors
+
+    def renderProgressive(self, filename, engine=RENDER_ENGINE, writer=None,
+                          output_dir="frames", max_samples=PROGRESSIVE_MAX_SAMPLES,
+                          time_budget=PROGRESSIVE_TIME_BUDGET,
+                          tolerance=PROGRESSIVE_TOLERANCE, snapshots=True, on_pass=None):
+        """
+        Render a frame in passes of one sample per pixel, accumulated in a
+        float buffer. After each pass the current image replaces the frame
+        file (snapshots=False writes only the final image) and
+        on_pass(buffer, elapsed) is called. Stops after max_samples passes,
+        when another pass would overrun time_budget seconds, or once the
+        buffer's standard error is at most tolerance.
+        Returns the AccumulationBuffer.
+        """
+        from progressive import AccumulationBuffer
+        renderer = None
+        if engine == RENDER_ENGINE_NUMPY:
+            from numpyrenderer import NumpyRenderer
+            renderer = NumpyRenderer(self)
+        
+        os.makedirs(output_dir, exist_ok=True)
+        file_path = os.path.join(output_dir, filename)
+        if writer is None:
+            writer = getFrameWriter()
+        
+        buffer = AccumulationBuffer(IMAGE_WIDTH, IMAGE_HEIGHT)
+        start_time = time.perf_counter()
+        while True:
+            with self.timed("trace"):
+                buffer.addPass(self.tracePass(engine, buffer.samples, renderer))
+            elapsed = time.perf_counter() - start_time
+            
+            # Leave room for one more pass at the average pass time
+            done = (buffer.samples >= max_samples or
+                    (time_budget is not None and
+                     elapsed + elapsed / buffer.samples > time_budget) or
+                    buffer.standardError() <= tolerance)
+            if snapshots or done:
+                self.pixels = buffer.toFramebuffer()
+                with self.timed("write"):
+                    writer.replace(file_path, IMAGE_WIDTH, IMAGE_HEIGHT, self.pixels.view())
+            if on_pass is not None:
+                on_pass(buffer, elapsed)
+            if done:
+                break
+        
+        self.sample_counts = Framebuffer(
+            IMAGE_WIDTH, IMAGE_HEIGHT, 1, FRAMEBUFFER_UINT16,
+            array(FRAMEBUFFER_UINT16, [buffer.samples]) * (IMAGE_WIDTH * IMAGE_HEIGHT))
+        return buffer
@@ -0,0 +1,349 @@
+import math
+from constants import *
+from vector3d import Vector3d
+from scenestore import SceneStore
+from screencull import ScreenCuller
+
+# Dirty region covering the whole frame
+FULL_FRAME = (0, 0, IMAGE_WIDTH, IMAGE_HEIGHT)
+
+# Soft-shadow rays are jittered by up to this much per axis (see Image.calcShadows)
+LIGHT_JITTER = 0.5
+
+
+def sceneState(image):
+    """Snapshot of everything that affects shading: camera, lights and spheres."""
+    camera = image.camera
+    camera_state = tuple(vector.to_tuple() for vector in (
+        camera.origin, camera.lower_left, camera.horizontal, camera.vertical))
+    light_state = tuple((light.getPosition().to_tuple(), light.ambient, light.diffuse,
+                         light.specular, light.getColor().to_tuple())
+                        for light in image.lights)
+    scene = image.scene
+    sphere_state = tuple((scene.center_x[i], scene.center_y[i], scene.center_z[i],
+                          scene.radii[i], tuple(scene.colors[i * 3:i * 3 + 3]),
+                          scene.texture_types[i], scene.shadow_types[i])
+                         for i in range(len(scene)))
+    return camera_state, light_state, sphere_state
+
+
+def pointsBox(camera, points, margin):
+    """
+    Pixel rectangle (x0, y0, x1, y1) covering the projection of points,
+    grown by margin pixels and clipped to the frame; None if it is empty.
+    Points behind the camera make the whole frame dirty.
+    """
+    xs = []
+    ys = []
+    for point in points:
+        projected = camera.projectPoint(point)
+        if projected is None:
+            return FULL_FRAME
+        xs.append(projected[0] * (IMAGE_WIDTH - 1))
+        ys.append(projected[1] * (IMAGE_HEIGHT - 1))
+    if not xs:
+        return None
+
+    x0 = max(0, math.floor(min(xs)) - margin)
+    y0 = max(0, math.floor(min(ys)) - margin)
+    x1 = min(IMAGE_WIDTH, math.floor(max(xs)) + 1 + margin)
+    y1 = min(IMAGE_HEIGHT, math.floor(max(ys)) + 1 + margin)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1, y1
+
+
+def sphereBox(camera, center, radius, margin):
+    """Pixel rectangle covering a sphere, from the corners of its bounding box."""
+    corners = [Vector3d(center.x + dx, center.y + dy, center.z + dz)
+               for dx in (-radius, radius) for dy in (-radius, radius)
+               for dz in (-radius, radius)]
+    return pointsBox(camera, corners, margin)
+
+
+def shadowBox(camera, scene, index, light_pos, margin, rays=INCREMENTAL_SILHOUETTE_RAYS):
+    """
+    Pixel rectangle covering the shadow sphere `index` casts from a light.
+    Rays are cast along the shadow cone's silhouette from every corner of
+    the soft-shadow jitter box and stopped at the first receiver behind the
+    sphere. A silhouette ray that escapes the scene makes the whole frame
+    dirty, since the footprint can then not be bounded this way.
+    """
+    center = scene.spheres[index].getCenter()
+    radius = scene.radii[index]
+    receivers = SceneStore(sphere for i, sphere in enumerate(scene.spheres) if i != index)
+
+    hit_points = []
+    for jx in (-LIGHT_JITTER, LIGHT_JITTER):
+        for jy in (-LIGHT_JITTER, LIGHT_JITTER):
+            for jz in (-LIGHT_JITTER, LIGHT_JITTER):
+                source = Vector3d(light_pos.x + jx, light_pos.y + jy, light_pos.z + jz)
+                axis = center - source
+                distance = axis.length()
+                if distance <= radius * 1.01:
+                    return FULL_FRAME
+                axis = axis * (1.0 / distance)
+
+                # Orthonormal frame around the cone axis
+                helper = Vector3d(1, 0, 0) if abs(axis.x) < 0.9 else Vector3d(0, 1, 0)
+                side = axis.cross(helper).normalize()
+                up = axis.cross(side)
+
+                # Slightly wider than the tangent cone so the rays clear the sphere
+                sin_angle = min(1.0, radius * 1.01 / distance)
+                cos_angle = math.sqrt(1.0 - sin_angle * sin_angle)
+                tangent = math.sqrt(max(0.0, distance * distance - radius * radius))
+                for k in range(rays):
+                    phi = 2 * math.pi * k / rays
+                    direction = (axis * cos_angle +
+                                 side * (sin_angle * math.cos(phi)) +
+                                 up * (sin_angle * math.sin(phi)))
+                    origin = source + direction * tangent
+                    hit, t = receivers.closestHitRaw(origin.x, origin.y, origin.z,
+                                                     direction.x, direction.y, direction.z)
+                    if hit < 0:
+                        return FULL_FRAME
+                    hit_points.append(origin + direction * t)
+    return pointsBox(camera, hit_points, margin)
+
+
+def mirrorBox(camera, scene, index, mirror, margin):
+    """
+    Pixel rectangle covering the reflection of sphere `index` in a large
+    sphere, treated as a plane mirror tangent to it below the reflected
+    sphere (a convex mirror shows a smaller image inside that one).
+    """
+    center = scene.spheres[index].getCenter()
+    mirror_center = scene.spheres[mirror].getCenter()
+    normal = center - mirror_center
+    if normal.length() <= scene.radii[mirror]:
+        return FULL_FRAME
+    normal = normal.normalize()
+    foot = mirror_center + normal * scene.radii[mirror]
+    image_center = center - normal * (2.0 * (center - foot).dot(normal))
+    return sphereBox(camera, image_center, scene.radii[index], margin)
+
+
+def mergeRegions(regions):
+    """Merge overlapping or touching rectangles into their bounding rectangles."""
+    regions = list(regions)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                a = regions[i]
+                b = regions[j]
+                if a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]:
+                    regions[i] = (min(a[0], b[0]), min(a[1], b[1]),
+                                  max(a[2], b[2]), max(a[3], b[3]))
+                    del regions[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return regions
+
+
+def litCells(cullers):
+    """
+    Screen cells (row-major, CULL_CELL_SIZE pixels) where a primary ray can
+    hit a sphere in any of the ScreenCullers' scenes: everything a moving
+    light can change. The rest shows only the background gradient, which
+    ignores the lights.
+    """
+    lit = set()
+    for culler in cullers:
+        lit.update(cell for cell, found in enumerate(culler.candidates) if found)
+    return lit
+
+
+def cellRegions(cells, regions, cell_size=CULL_CELL_SIZE):
+    """
+    Rectangles covering the cells plus every cell the regions touch: runs
+    of cells per cell row, with equal runs of consecutive rows joined.
+    Unlike mergeRegions this does not grow a staircase of cells into its
+    bounding box.
+    """
+    cells_x = -(-IMAGE_WIDTH // cell_size)
+    cells = set(cells)
+    for x0, y0, x1, y1 in regions:
+        for cy in range(y0 // cell_size, (y1 - 1) // cell_size + 1):
+            cells.update(cy * cells_x + cx
+                         for cx in range(x0 // cell_size, (x1 - 1) // cell_size + 1))
+
+    rectangles = []
+    open_runs = {}  # (cx0, cx1) -> index in rectangles of the run ending on the row above
+    for cy in range(-(-IMAGE_HEIGHT // cell_size)):
+        runs = {}
+        cx = 0
+        while cx < cells_x:
+            if cy * cells_x + cx not in cells:
+                cx += 1
+                continue
+            start = cx
+            while cx < cells_x and cy * cells_x + cx in cells:
+                cx += 1
+            y1 = min((cy + 1) * cell_size, IMAGE_HEIGHT)
+            index = open_runs.get((start, cx))
+            if index is None:
+                index = len(rectangles)
+                rectangles.append((start * cell_size, cy * cell_size,
+                                   min(cx * cell_size, IMAGE_WIDTH), y1))
+            else:
+                x0, y0, x1, _ = rectangles[index]
+                rectangles[index] = (x0, y0, x1, y1)
+            runs[(start, cx)] = index
+        open_runs = runs
+    return rectangles
+
+
+def dirtyRegions(camera, lights, scenes, changed, margin=INCREMENTAL_MARGIN,
+                 previous_lights=None, cullers=None):
+    """
+    Screen rectangles that can differ when the spheres in `changed` move
+    between the scenes in `scenes` (previous and current; camera unchanged).
+    Covers the spheres themselves, their shadows, and their reflections:
+    small spheres that could reflect them are redrawn whole, and large ones
+    are treated as plane mirrors. previous_lights are the previous frame's
+    light positions if the lights moved: the shadows every small sphere
+    casts from the old and new positions are then added, along with the
+    lit footprint (litCells) the moving lights shade, from cullers (one
+    ScreenCuller per scene, built if not given).
+    """
+    regions = []
+    for scene in scenes:
+        if not changed:
+            break
+        changed_radius = min(scene.radii[index] for index in changed)
+        large = [i for i in range(len(scene))
+                 if i not in changed and
+                 scene.radii[i] >= changed_radius * INCREMENTAL_MIRROR_RATIO]
+        affected = [i for i in range(len(scene)) if i not in large]
+
+        for index in affected:
+            regions.append(sphereBox(camera, scene.spheres[index].getCenter(),
+                                     scene.radii[index], margin))
+            for mirror in large:
+                regions.append(mirrorBox(camera, scene, index, mirror, margin))
+
+    positions = [light.getPosition() for light in lights]
+    if previous_lights is not None:
+        positions += previous_lights
+    for scene in scenes:
+        casters = set(changed)
+        if previous_lights is not None:
+            # The stage and other large spheres receive shadows rather than cast them
+            smallest = min(scene.radii)
+            casters.update(index for index in range(len(scene))
+                           if scene.radii[index] < smallest * INCREMENTAL_MIRROR_RATIO)
+        for index in sorted(casters):
+            regions.extend(shadowBox(camera, scene, index, position, margin)
+                           for position in positions)
+
+    regions = [region for region in regions if region is not None]
+    if FULL_FRAME in regions:
+        return [FULL_FRAME]
+    if previous_lights is not None:
+        if cullers is None:
+            cullers = [ScreenCuller(camera, scene) for scene in scenes]
+        return cellRegions(litCells(cullers), regions)
+    return mergeRegions(regions)
+
+
+class IncrementalRenderer:
+    """
+    Renders a fixed-camera frame sequence, re-tracing only the screen
+    regions the moving spheres and lights can have changed since the
+    previous frame and copying the rest of the previous framebuffer.
+    Falls back to a full render on the first frame, or when the camera,
+    the number of spheres or the lights other than their positions change
+    (lighting that changes globally), or when the dirty regions cover more
+    than max_dirty of the frame.
+    """
+    def __init__(self, engine=RENDER_ENGINE, workers=1, tile_size=TILE_SIZE,
+                 adaptive=ADAPTIVE_SAMPLING, margin=INCREMENTAL_MARGIN,
+                 max_dirty=INCREMENTAL_MAX_DIRTY):
+        """Configure how frames are traced; the first frame is always full."""
+        self.engine = engine
+        self.workers = workers
+        self.tile_size = tile_size
+        self.adaptive = adaptive
+        self.margin = margin
+        self.max_dirty = max_dirty
+        self.previous = None  # (state, scene, pixels, sample_counts, culler)
+
+        self.regions = []        # Rectangles re-traced for the last frame
+        self.reason = None       # Why the last frame was rendered in full, or None
+        self.full_frames = 0
+        self.incremental_frames = 0
+        self.traced_pixels = 0
+
+    def plan(self, image, state):
+        """Return (regions to re-trace, None) or (None, reason for a full render)."""
+        if self.previous is None:
+            return None, "first frame"
+        previous_state, previous_scene = self.previous[:2]
+        camera_state, light_state, sphere_state = state
+        if camera_state != previous_state[0]:
+            return None, "camera moved"
+        previous_lights = previous_state[1]
+        if (len(light_state) != len(previous_lights) or
+                [light[1:] for light in light_state] != [light[1:] for light in previous_lights]):
+            return None, "lights changed"
+        if len(sphere_state) != len(previous_state[2]):
+            return None, "spheres added or removed"
+
+        changed = [i for i, (new, old) in enumerate(zip(sphere_state, previous_state[2]))
+                   if new != old]
+        moved_lights = None
+        if [light[0] for light in light_state] != [light[0] for light in previous_lights]:
+            moved_lights = [Vector3d(*light[0]) for light in previous_lights]
+        if not changed and moved_lights is None:
+            return [], None
+        regions = dirtyRegions(image.camera, image.lights, (previous_scene, image.scene),
+                               changed, self.margin, moved_lights,
+                               (self.previous[4], self.culler(image)))
+        area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions)
+        if area > self.max_dirty * IMAGE_WIDTH * IMAGE_HEIGHT:
+            return None, f"{100.0 * area / (IMAGE_WIDTH * IMAGE_HEIGHT):.0f}% of the frame changed"
+        return regions, None
+
+    def culler(self, image):
+        """ScreenCuller of image's scene: the one it renders with, if it uses one."""
+        return image.primaryCuller() or ScreenCuller(image.camera, image.scene)
+
+    def render(self, image):
+        """Fill image.pixels (and image.sample_counts) for the next frame."""
+        state = sceneState(image)
+        regions, self.reason = self.plan(image, state)
+
+        if regions is None:
+            image.renderPixels(self.engine, self.workers, self.tile_size, self.adaptive)
+            self.regions = [FULL_FRAME]
+            self.full_frames += 1
+            self.traced_pixels += IMAGE_WIDTH * IMAGE_HEIGHT
+        else:
+            pixels = self.previous[2].copy()
+            sample_counts = self.previous[3].copy()
+            for x0, y0, x1, y1 in regions:
+                region_pixels, region_counts = image.traceRegion(self.engine, x0, y0, x1, y1,
+                                                                 self.adaptive)
+                pixels.paste(region_pixels, x0, y0)
+                sample_counts.paste(region_counts, x0, y0)
+                self.traced_pixels += (x1 - x0) * (y1 - y0)
+            image.pixels = pixels
+            image.sample_counts = sample_counts
+            self.regions = regions
+            self.incremental_frames += 1
+
+        self.previous = (state, image.scene, image.pixels, image.sample_counts,
+                         self.culler(image))
+        return image.pixels
+
+    def summary(self):
+        """One-line report of full versus incremental frames."""
+        frames = self.full_frames + self.incremental_frames
+        traced = self.traced_pixels / max(frames * IMAGE_WIDTH * IMAGE_HEIGHT, 1)
+        return (f"{self.incremental_frames}/{frames} frames incremental, "
+                f"{100.0 * traced:.1f}% of pixels traced")
@@ -1,10 +1,21 @@
 import time
 import os
+import argparse
+import csv
+from functools import partial
+from multiprocessing import Pool
+from queue import Queue
 from PIL import Image as PILImage
 from image import Image
 from constants import *
 from vector3d import Vector3d
 from camera import Camera
+from framewriter import getFrameWriter
+from videostream import FFmpegStream, ReorderBuffer
+from pipeline import Pipeline
+from incremental import IncrementalRenderer
+from checkpoint import FrameManifest, settingsHash
+from timeline import Timeline, getTimeline
 
 def format_time(seconds):
     """Format render time nicely."""
@@ -28,8 +39,26 @@ def create_scene_description(t):
     else:
         return "Finale"
 
-def render_frame(frame_num, total_frames):
-    """Render a single frame."""
+def frame_output_dir(frame_format):
+    """Directory a frame format is written to; PNG frames skip the conversion pass."""
+    return "frames_png" if frame_format == FRAME_FORMAT_PNG else "frames"
+
+def frame_filename(frame_num, total_frames, extension):
+    """Descriptive frame file name, e.g. frame_0042_Opening.ppm."""
+    scene_desc = create_scene_description(frame_num / total_frames)
+    return f"frame_{frame_num:04d}_{scene_desc}{extension}"
+
+def frame_path(frame_num, total_frames, frame_format=FRAME_FORMAT):
+    """Path a frame file is written to."""
+    extension = getFrameWriter(frame_format).extension
+    return os.path.join(frame_output_dir(frame_format),
+                        frame_filename(frame_num, total_frames, extension))
+
+def create_frame_image(frame_num, total_frames, stats=False, timeline=None):
+    """
+    Build the camera and animated scene for one frame; stats enables RenderStats.
+    timeline is the path of a baked Timeline to take the frame's state from.
+    """
     t = frame_num / total_frames
     
     # Initialize camera
@@ -41,36 +70,147 @@ def render_frame(frame_num, total_frames):
         aspect=CAMERA_ASPECT
     )
     
-    # Create and render image
-    image = Image(camera)
-    image.createAnimatedScene(t)
+    # Create image
+    image = Image(camera, seed=SAMPLE_SEED + frame_num, stats=stats)
+    with image.timed("scene"):
+        if timeline is not None:
+            baked = getTimeline(timeline)
+            if baked.total_frames != total_frames:
+                raise ValueError(f"{timeline} holds {baked.total_frames} frames, "
+                                 f"not {total_frames}")
+            baked.applyTo(image, frame_num)
+        else:
+            image.createAnimatedScene(t)
+    return image
+
+def render_frame(frame_num, total_frames, engine=RENDER_ENGINE, tile_workers=1,
+                 frame_format=FRAME_FORMAT, durable=DURABLE_WRITES,
+                 adaptive=ADAPTIVE_SAMPLING, sample_map=False, progressive=None, stats=False,
+                 output_dir=None, timeline=None):
+    """
+    Render a single frame, optionally tile-parallel across tile_workers processes.
+    output_dir defaults to the frame format's directory (see frame_output_dir).
+    sample_map also writes the per-pixel sample counts to frames_samples/.
+    progressive is a dict of Image.renderProgressive options; when given the
+    frame is refined pass by pass in this process instead.
+    timeline is the path of a baked Timeline (see create_frame_image).
+    Returns (frame_num, RenderStats of the frame or None unless stats is set).
+    """
+    image = create_frame_image(frame_num, total_frames, stats, timeline)
+    if output_dir is None:
+        output_dir = frame_output_dir(frame_format)
     
     # Generate descriptive filename
-    scene_desc = create_scene_description(t)
-    filename = f"frame_{frame_num:04d}_{scene_desc}.ppm"
+    writer = getFrameWriter(frame_format, durable)
+    filename = frame_filename(frame_num, total_frames, writer.extension)
     
     # Save frame
-    image.renderFrame(filename)
+    if progressive is not None:
+        image.renderProgressive(filename, engine, writer=writer,
+                                output_dir=output_dir, **progressive)
+    else:
+        image.renderFrame(filename, engine, workers=tile_workers, writer=writer,
+                          output_dir=output_dir, adaptive=adaptive)
+    if sample_map:
+        image.writeSampleCounts(filename, writer)
     
-    return frame_num
+    return frame_num, image.stats
+
+def render_frame_rgb(frame_num, total_frames, engine=RENDER_ENGINE, tile_workers=1,
+                     adaptive=ADAPTIVE_SAMPLING):
+    """Render a single frame in memory and return (frame_num, packed RGB bytes)."""
+    image = create_frame_image(frame_num, total_frames)
+    pixels = image.renderPixels(engine, workers=tile_workers, adaptive=adaptive)
+    return frame_num, pixels.tobytes()
 
-def convert_to_png(input_folder="frames", output_folder="frames_png"):
-    """Convert all PPM files to PNG format."""
+def trace_image(image, engine=RENDER_ENGINE, adaptive=ADAPTIVE_SAMPLING):
+    """Trace a prepared frame image and return packed RGB bytes (pool task)."""
+    return image.renderPixels(engine, adaptive=adaptive).tobytes()
+
+def render_pipeline(total_frames, workers=1, engine=RENDER_ENGINE,
+                    frame_format=FRAME_FORMAT, durable=DURABLE_WRITES,
+                    adaptive=ADAPTIVE_SAMPLING, manifest=None, frames=None):
+    """
+    Render all frames as overlapped scene / trace / encode / write stages.
+    Tracing runs in a process pool; the other stages are threads. Bounded
+    queues between stages apply back-pressure. Frames already complete in
+    the FrameManifest (or only `frames`, if given) are rendered and new ones
+    recorded. Returns the Pipeline so its per-stage statistics can be reported.
+    """
+    writer = getFrameWriter(frame_format, durable)
+    output_dir = frame_output_dir(frame_format)
+    os.makedirs(output_dir, exist_ok=True)
+    if frames is None:
+        frames = pending_frames(total_frames, manifest)
+    start_time = time.time()
+    done = [0]
+    
+    def build_scene(frame_num):
+        filename = frame_filename(frame_num, total_frames, writer.extension)
+        return frame_num, filename, create_frame_image(frame_num, total_frames)
+    
+    def encode(item):
+        frame_num, filename, rgb = item
+        return frame_num, filename, writer.encode(IMAGE_WIDTH, IMAGE_HEIGHT, rgb)
+    
+    def write(item):
+        frame_num, filename, data = item
+        path = os.path.join(output_dir, filename)
+        writer.writeEncoded(path, data)
+        return frame_num, path
+    
+    def progress(result):
+        if manifest is not None:
+            manifest.record(*result)
+        done[0] += 1
+        print_progress(done[0], len(frames), start_time)
+    
+    pool = Pool(processes=workers) if workers > 1 else None
+    try:
+        def trace(item):
+            frame_num, filename, image = item
+            if pool is None:
+                return frame_num, filename, trace_image(image, engine, adaptive)
+            return frame_num, filename, pool.apply(trace_image, (image, engine, adaptive))
+        
+        pipeline = (Pipeline()
+                    .addStage("scene", build_scene)
+                    .addStage("trace", trace, workers=workers)
+                    .addStage("encode", encode)
+                    .addStage("write", write))
+        pipeline.run(frames, callback=progress)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return pipeline
+
+def convert_to_png(input_folder="frames", output_folder="frames_png", manifest=None):
+    """
+    Convert PPM files to PNG format. With a FrameManifest only frames whose
+    PNG is missing or stale are converted, and each conversion is recorded.
+    """
     print("\nConverting frames to PNG...")
     
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
     
-    ppm_files = sorted([f for f in os.listdir(input_folder) if f.endswith('.ppm')])
-    total = len(ppm_files)
+    if manifest is not None:
+        frame_files = manifest.pendingPng()
+    else:
+        frame_files = [(None, os.path.join(input_folder, f))
+                       for f in sorted(os.listdir(input_folder)) if f.endswith('.ppm')]
+    total = len(frame_files)
     
-    for i, filename in enumerate(ppm_files, 1):
-        input_path = os.path.join(input_folder, filename)
+    for i, (frame, input_path) in enumerate(frame_files, 1):
+        filename = os.path.basename(input_path)
         output_path = os.path.join(output_folder, filename.replace('.ppm', '.png'))
         
         try:
             with PILImage.open(input_path) as img:
                 img.save(output_path, 'PNG')
+            if manifest is not None:
+                manifest.recordPng(frame, output_path)
             
             if i % 10 == 0:
                 print(f"Progress: {i}/{total} frames ({(i/total)*100:.1f}%)")
@@ -78,41 +218,364 @@ def convert_to_png(input_folder="frames", output_folder="frames_png"):
         except Exception as e:
             print(f"Error converting {filename}: {str(e)}")
 
-def main():
+def print_progress(done, total, start_time):
+    """Print progress, render speed and ETA for completed frames."""
+    elapsed = time.time() - start_time
+    estimated_total = (elapsed / done) * total
+    remaining = estimated_total - elapsed
+    current_fps = done / elapsed if elapsed > 0 else 0
+    
+    print(f"\rFrame {done}/{total} "
+          f"({done/total*100:.1f}%) "
+          f"@ {current_fps:.1f} fps - "
+          f"Remaining: {format_time(remaining)}", end="")
+
+def print_pass(buffer, elapsed):
+    """Report one progressive pass of a single-frame render."""
+    print(f"\rPass {buffer.samples}: {elapsed:.1f}s, "
+          f"noise {buffer.standardError():.2f}", end="")
+
+def pending_frames(total_frames, manifest=None):
+    """Frames still to render: all of them, or those the manifest lacks."""
+    if manifest is None:
+        return list(range(total_frames))
+    return manifest.pendingFrames(range(total_frames))
+
+def render_frames(total_frames, workers=1, manifest=None, frames=None, **frame_options):
+    """
+    Render all frames, spreading them over a process pool if workers > 1.
+    Frames already complete in the FrameManifest are skipped (or only
+    `frames` are rendered, if given) and new ones recorded as they finish.
+    frame_options are passed through to render_frame.
+    Returns {frame: RenderStats} when frame_options enables stats (else empty).
+    """
+    if frames is None:
+        frames = pending_frames(total_frames, manifest)
+    frame_format = frame_options.get("frame_format", FRAME_FORMAT)
+    frame_stats = {}
+    start_time = time.time()
+    
+    def finished(done, result):
+        frame, stats = result
+        if manifest is not None:
+            manifest.record(frame, frame_path(frame, total_frames, frame_format))
+        if stats is not None:
+            frame_stats[frame] = stats
+            print(f"\rFrame {frame}: {stats.summary()}")
+        print_progress(done, len(frames), start_time)
+    
+    if workers <= 1:
+        for done, frame in enumerate(frames, 1):
+            finished(done, render_frame(frame, total_frames, **frame_options))
+        return frame_stats
+    
+    # Frames are independent, so completion order does not matter; chunksize 1
+    # keeps slow frames from holding back a batch of queued ones
+    task = partial(render_frame, total_frames=total_frames, **frame_options)
+    with Pool(processes=workers) as pool:
+        for done, result in enumerate(pool.imap_unordered(task, frames), 1):
+            finished(done, result)
+    return frame_stats
+
+def write_stats_csv(path, frame_stats, total_frames):
+    """Write one CSV row of RenderStats per frame, in frame order."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = None
+        for frame in sorted(frame_stats):
+            t = frame / total_frames
+            row = {"frame": frame, "t": round(t, 6), "scene": create_scene_description(t)}
+            row.update(frame_stats[frame].asDict())
+            if writer is None:
+                writer = csv.DictWriter(f, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
+
+def render_frames_incremental(total_frames, workers=1, engine=RENDER_ENGINE,
+                              frame_format=FRAME_FORMAT, durable=DURABLE_WRITES,
+                              adaptive=ADAPTIVE_SAMPLING, manifest=None, frames=None):
+    """
+    Render all frames in order, re-tracing only the regions moving spheres
+    and lights changed since the previous frame. Full renders use workers tile processes.
+    Frames already complete in the FrameManifest are skipped, or only
+    `frames` are rendered if given (the next one is then diffed against the
+    last frame rendered in this run).
+    Returns the IncrementalRenderer so its summary can be reported.
+    """
+    writer = getFrameWriter(frame_format, durable)
+    os.makedirs(frame_output_dir(frame_format), exist_ok=True)
+    renderer = IncrementalRenderer(engine, workers, adaptive=adaptive)
+    if frames is None:
+        frames = pending_frames(total_frames, manifest)
+    start_time = time.time()
+    
+    for done, frame in enumerate(frames, 1):
+        image = create_frame_image(frame, total_frames)
+        pixels = renderer.render(image)
+        path = frame_path(frame, total_frames, frame_format)
+        writer.write(path, IMAGE_WIDTH, IMAGE_HEIGHT, pixels.view())
+        if manifest is not None:
+            manifest.record(frame, path)
+        print_progress(done, len(frames), start_time)
+    return renderer
+
+def stream_frames(total_frames, video_path, workers=1, engine=RENDER_ENGINE, window=None,
+                  adaptive=ADAPTIVE_SAMPLING):
+    """
+    Render all frames straight into an ffmpeg encoder, with no frame files.
+    Frames may finish out of order across workers; a reorder buffer releases
+    them in order and at most `window` frames are rendering or waiting at once.
+    """
+    window = window or max(2, workers * 2)
+    start_time = time.time()
+    
+    with FFmpegStream(video_path) as stream:
+        reorder = ReorderBuffer(stream.writeFrame, capacity=window)
+        
+        if workers <= 1:
+            for frame in range(total_frames):
+                reorder.push(*render_frame_rgb(frame, total_frames, engine,
+                                               adaptive=adaptive))
+                print_progress(frame + 1, total_frames, start_time)
+            return
+        
+        results = Queue()
+        with Pool(processes=workers) as pool:
+            next_frame = 0
+            for done in range(1, total_frames + 1):
+                # Only dispatch frames that fit in the window ahead of the writer
+                while (next_frame < total_frames and
+                       next_frame < reorder.next_index + window):
+                    pool.apply_async(render_frame_rgb,
+                                     (next_frame, total_frames, engine, 1, adaptive),
+                                     callback=results.put, error_callback=results.put)
+                    next_frame += 1
+                
+                result = results.get()
+                if isinstance(result, BaseException):
+                    raise result
+                reorder.push(*result)
+                print_progress(done, total_frames, start_time)
+
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Render the Christmas animation.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of render processes (0 = one per CPU core)")
+    parser.add_argument("--engine", default=RENDER_ENGINE,
+                        choices=[RENDER_ENGINE_PYTHON, RENDER_ENGINE_NUMPY],
+                        help="render engine used for each frame")
+    parser.add_argument("--frame", type=int, default=None,
+                        help="render only this frame, split into tiles across the workers")
+    parser.add_argument("--format", dest="frame_format", default=FRAME_FORMAT,
+                        choices=[FRAME_FORMAT_P3, FRAME_FORMAT_P6, FRAME_FORMAT_PNG],
+                        help="frame file format: P3 (ASCII PPM, the default), P6 (binary PPM, "
+                             "about 3-4x smaller and faster to write) or PNG (needs no "
+                             "conversion pass)")
+    parser.add_argument("--video", default=None, metavar="PATH",
+                        help="stream frames into ffmpeg and write this video file "
+                             "instead of frame images")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="overlap scene building, tracing, encoding and writing "
+                             "and report per-stage throughput")
+    parser.add_argument("--adaptive", action="store_true", default=ADAPTIVE_SAMPLING,
+                        help="variance-driven anti-aliasing between ADAPTIVE_MIN_SAMPLES "
+                             "and ADAPTIVE_MAX_SAMPLES per pixel")
+    parser.add_argument("--sample-map", action="store_true",
+                        help="also write per-pixel sample counts to frames_samples/")
+    parser.add_argument("--progressive", action="store_true",
+                        help="refine each frame file in passes, rewriting it after "
+                             "every pass (frame files only; tile workers are not used)")
+    parser.add_argument("--max-samples", type=int, default=PROGRESSIVE_MAX_SAMPLES,
+                        help="progressive mode: samples per pixel budget")
+    parser.add_argument("--time-budget", type=float, default=PROGRESSIVE_TIME_BUDGET,
+                        metavar="SECONDS", help="progressive mode: time budget per frame")
+    parser.add_argument("--tolerance", type=float, default=PROGRESSIVE_TOLERANCE,
+                        help="progressive mode: stop once the RMS standard error "
+                             "(0-255 units) is this low")
+    parser.add_argument("--incremental", action="store_true",
+                        help="render frames in order and re-trace only regions changed "
+                             "by moving spheres and lights (needs a fixed camera; "
+                             "frames fall back to full renders otherwise)")
+    parser.add_argument("--durable", action="store_true", default=DURABLE_WRITES,
+                        help="fsync every frame file before closing it")
+    parser.add_argument("--force", action="store_true",
+                        help="ignore the frame manifest and re-render every frame")
+    parser.add_argument("--stats", action="store_true",
+                        help="count rays, intersection tests and texture evaluations and "
+                             "time each stage; prints a summary per frame")
+    parser.add_argument("--stats-csv", default=None, metavar="PATH",
+                        help="write the per-frame statistics to this CSV file "
+                             "(implies --stats)")
+    parser.add_argument("--timeline", default=None, metavar="PATH",
+                        help="take each frame's animation state from this baked timeline, "
+                             "baking it first if the file does not exist (frame files "
+                             "rendered one frame per task only)")
+    args = parser.parse_args(argv)
+    args.stats = args.stats or args.stats_csv is not None
+    if args.stats and (args.video or args.pipeline or args.incremental):
+        parser.error("--stats needs frame files rendered one frame per task "
+                     "(not --video, --pipeline or --incremental)")
+    if args.timeline and (args.video or args.pipeline or args.incremental):
+        parser.error("--timeline needs frame files rendered one frame per task "
+                     "(not --video, --pipeline or --incremental)")
+    if args.workers <= 0:
+        args.workers = os.cpu_count() or 1
+    args.progressive_options = None
+    if args.progressive:
+        args.progressive_options = dict(max_samples=args.max_samples,
+                                        time_budget=args.time_budget,
+                                        tolerance=args.tolerance)
+    return args
+
+def load_timeline(path, total_frames):
+    """
+    Load the baked Timeline at path, (re)baking and saving it first if it is
+    missing or was baked for another frame count; prints its motion bounds.
+    """
+    try:
+        timeline = getTimeline(path)
+    except (OSError, ValueError):
+        timeline = None
+    if timeline is None or timeline.total_frames != total_frames:
+        start_time = time.perf_counter()
+        Timeline.bake(total_frames).save(path)
+        timeline = getTimeline(path)
+        print(f"Timeline: baked to {path} in {time.perf_counter() - start_time:.3f}s")
+    print(f"Timeline: {timeline.summary()}")
+    for index, (lo, hi) in enumerate(timeline.motionBounds()):
+        print(f"  sphere {index}: x {lo[0]:.2f}..{hi[0]:.2f}, "
+              f"y {lo[1]:.2f}..{hi[1]:.2f}, z {lo[2]:.2f}..{hi[2]:.2f}")
+    return timeline
+
+# Constants that change frame contents, hashed into the manifest with
+# frame_settings. Engine tuning, farm, benchmark and file-handling
+# constants are left out so changing them keeps finished frames valid.
+FRAME_CONSTANTS = (
+    # Image size and animation timing
+    "IMAGE_WIDTH", "IMAGE_HEIGHT", "FPS", "DURATION", "TOTAL_FRAMES",
+    # Sampling
+    "ANTI_ALIASING_SAMPLES", "SOFT_SHADOW_SAMPLES", "MAX_RAY_DEPTH", "REFLECTION_CUTOFF",
+    "RAY_EPSILON", "ADAPTIVE_MIN_SAMPLES", "ADAPTIVE_MAX_SAMPLES", "ADAPTIVE_TOLERANCE",
+    "SAMPLE_SEED", "SAMPLE_TABLE_SIZE", "SCRAMBLE_TILE_SIZE",
+    "INCREMENTAL_MARGIN", "INCREMENTAL_MAX_DIRTY", "INCREMENTAL_MIRROR_RATIO",
+    "INCREMENTAL_SILHOUETTE_RAYS",
+    # Shading and textures
+    "CHRISTMAS_RED", "CHRISTMAS_GREEN", "GOLD", "SILVER", "WHITE",
+    "WARM_GOLD_LIGHT", "COOL_SILVER_LIGHT", "BACKGROUND_COLOR_TOP", "BACKGROUND_COLOR_BOTTOM",
+    "AMBIENT_INTENSITY", "DIFFUSE_INTENSITY", "SPECULAR_INTENSITY", "SPECULAR_POWER",
+    "SHADOW_INTENSITY", "STRIPE_FREQUENCY", "CHECKERBOARD_SCALE", "STRIPE_SHIMMER_COLOR",
+    "CHECKER_COLOR_EVEN", "CHECKER_COLOR_ODD", "STRIPE_TABLE_WIDTH", "STRIPE_TABLE_HEIGHT",
+    "STRIPE_TABLE_SUPERSAMPLE",
+    # Scene motion and camera
+    "P0", "P1", "P2", "P3", "P0_2", "P1_2", "P2_2", "P3_2",
+    "CIRCLE_RADIUS", "CIRCLE_HEIGHT", "CIRCLE_VERTICAL_SPEED", "CIRCLE_ORBIT_SPEED",
+    "BOUNCE_AMOUNT", "PHASE_1_END", "PHASE_2_END", "PHASE_3_END",
+    "CAMERA_FOV", "CAMERA_ASPECT",
+    # Output format
+    "FRAME_FORMAT",
+)
+
+def frame_settings(args):
+    """Command line options that change frame contents (part of the manifest hash)."""
+    return {"engine": args.engine, "frame_format": args.frame_format,
+            "adaptive": args.adaptive, "progressive": args.progressive_options,
+            "incremental": args.incremental}
+
+def main(argv=None):
     """Main function to render all frames."""
+    args = parse_args(argv)
+    
     print("\nChristmas Sugar Plum Fairy Animation Renderer")
     print("=" * 60)
     print(f"Resolution: {IMAGE_WIDTH}x{IMAGE_HEIGHT}")
     print(f"Total frames: {TOTAL_FRAMES} ({DURATION}s at {FPS}fps)")
-    print(f"Anti-aliasing: {ANTI_ALIASING_SAMPLES}x")
+    if args.adaptive:
+        print(f"Anti-aliasing: adaptive {ADAPTIVE_MIN_SAMPLES}-{ADAPTIVE_MAX_SAMPLES}x")
+    else:
+        print(f"Anti-aliasing: {ANTI_ALIASING_SAMPLES}x")
     print(f"Shadow samples: {SOFT_SHADOW_SAMPLES}")
+    print(f"Engine: {args.engine}, workers: {args.workers}")
+    print(f"Frame format: {args.frame_format}{' (durable)' if args.durable else ''}")
+    if args.timeline:
+        load_timeline(args.timeline, TOTAL_FRAMES)
     
     # Create output directories
-    os.makedirs("frames", exist_ok=True)
-    os.makedirs("frames_png", exist_ok=True)
+    if not args.video:
+        os.makedirs("frames", exist_ok=True)
+        os.makedirs("frames_png", exist_ok=True)
+    
+    if args.frame is not None:
+        start_time = time.time()
+        _, stats = render_frame(args.frame, TOTAL_FRAMES, args.engine,
+                                tile_workers=args.workers, frame_format=args.frame_format,
+                                durable=args.durable, adaptive=args.adaptive,
+                                sample_map=args.sample_map,
+                                progressive=(dict(args.progressive_options, on_pass=print_pass)
+                                             if args.progressive else None),
+                                stats=args.stats, timeline=args.timeline)
+        if args.progressive:
+            print()
+        print(f"Frame {args.frame} rendered in {format_time(time.time() - start_time)}")
+        if stats is not None:
+            print(f"Stats: {stats.summary()}")
+            if args.stats_csv:
+                write_stats_csv(args.stats_csv, {args.frame: stats}, TOTAL_FRAMES)
+        return
     
     try:
         start_time = time.time()
+        manifest = None
+        
+        if args.video:
+            stream_frames(TOTAL_FRAMES, args.video, args.workers, args.engine,
+                          adaptive=args.adaptive)
+            total_time = time.time() - start_time
+            print(f"\n\nVideo written to {args.video}")
+            print(f"Total time: {format_time(total_time)}")
+            print(f"Average speed: {TOTAL_FRAMES / total_time:.1f} fps")
+            return
+        
+        # Frames already rendered with the same settings are skipped on resume
+        manifest = FrameManifest(os.path.join(frame_output_dir(args.frame_format),
+                                              MANIFEST_NAME),
+                                 settingsHash(frame_settings(args), FRAME_CONSTANTS))
+        if args.force:
+            manifest.clear()
+        # Checked once here: each check hashes every frame file on disk
+        frames = pending_frames(TOTAL_FRAMES, manifest)
+        done = TOTAL_FRAMES - len(frames)
+        if done:
+            print(f"Resuming: {done}/{TOTAL_FRAMES} frames already rendered")
         
         # Render all frames
-        for frame in range(TOTAL_FRAMES):
-            frame_start = time.time()
-            render_frame(frame, TOTAL_FRAMES)
-            
-            # Show progress
-            elapsed = time.time() - start_time
-            estimated_total = (elapsed / (frame + 1)) * TOTAL_FRAMES
-            remaining = estimated_total - elapsed
-            current_fps = (frame + 1) / elapsed if elapsed > 0 else 0
-            
-            print(f"\rFrame {frame+1}/{TOTAL_FRAMES} "
-                  f"({(frame+1)/TOTAL_FRAMES*100:.1f}%) "
-                  f"@ {current_fps:.1f} fps - "
-                  f"Remaining: {format_time(remaining)}", end="")
+        if args.pipeline:
+            pipeline = render_pipeline(TOTAL_FRAMES, args.workers, args.engine,
+                                       args.frame_format, args.durable, args.adaptive,
+                                       manifest, frames)
+            print("\n\nPipeline stages:")
+            for line in pipeline.report():
+                print(f"  {line}")
+        elif args.incremental:
+            renderer = render_frames_incremental(TOTAL_FRAMES, args.workers, args.engine,
+                                                 args.frame_format, args.durable,
+                                                 args.adaptive, manifest, frames)
+            print(f"\n\nIncremental: {renderer.summary()}")
+        else:
+            frame_stats = render_frames(TOTAL_FRAMES, args.workers, manifest, frames,
+                                        engine=args.engine, frame_format=args.frame_format,
+                                        durable=args.durable, adaptive=args.adaptive,
+                                        sample_map=args.sample_map,
+                                        progressive=args.progressive_options,
+                                        stats=args.stats, timeline=args.timeline)
+            if args.stats_csv:
+                write_stats_csv(args.stats_csv, frame_stats, TOTAL_FRAMES)
+                print(f"\nStatistics for {len(frame_stats)} frames written to "
+                      f"{args.stats_csv}")
         
         # Convert to PNG
-        print("\n\nConverting frames to PNG format...")
-        convert_to_png()
+        if args.frame_format != FRAME_FORMAT_PNG:
+            print("\n\nConverting frames to PNG format...")
+            convert_to_png(manifest=manifest)
         
         # Print completion message
         total_time = time.time() - start_time
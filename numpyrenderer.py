@@ -0,0 +1,398 @@
+import math
+from array import array
+import numpy as np
+from constants import *
+from framebuffer import Framebuffer
+from scenestore import TEXTURE_TYPES, SHADOW_TYPES
+from texture import STRIPE_STRENGTH, getStripeTable
+
+
+def normalizeRows(vectors):
+    """Normalize an (N, 3) array of vectors; zero-length rows stay zero."""
+    lengths = np.sqrt(np.einsum('ij,ij->i', vectors, vectors))
+    safe = np.where(lengths > 0, lengths, 1.0)
+    return vectors / safe[:, None]
+
+
+def dotRows(a, b):
+    """Row-wise dot product of two (N, 3) arrays."""
+    return np.einsum('ij,ij->i', a, b)
+
+
+class NumpyRenderer:
+    """
+    Whole-frame render engine that traces all rays of a frame as arrays.
+    Mirrors Image.calculatePixelColor: same textures, Blinn-Phong lighting,
+    shadows, reflections and 8-bit quantization, batched over rays.
+    """
+    def __init__(self, image):
+        """Snapshot the scene, lights and sample tables of an Image into arrays."""
+        self.camera = image.camera
+
+        # Zero-copy views of the sampler's tables; rays carry their pixel's
+        # scramble cell so offsets match the Python engine sample for sample
+        sampler = image.sampler
+        self.sampler = sampler
+        self.pixel_table = np.frombuffer(sampler.pixel_table).reshape(-1, 2)
+        self.light_table = np.frombuffer(sampler.light_table).reshape(-1, 3)
+        self.pixel_shifts = np.frombuffer(sampler.pixel_shifts).reshape(-1, 2)
+        self.light_shifts = np.frombuffer(sampler.light_shifts).reshape(-1, 3)
+        self.light_base = 0  # Light table row of shadow sample 0 for the current AA sample
+
+        # Zero-copy views of the structure-of-arrays scene store
+        scene = image.scene
+        self.centers = np.stack([np.frombuffer(scene.center_x),
+                                 np.frombuffer(scene.center_y),
+                                 np.frombuffer(scene.center_z)], axis=1)
+        self.radii = np.frombuffer(scene.radii)
+        self.radii_sq = np.frombuffer(scene.radii_sq)
+        self.colors = np.frombuffer(scene.colors).reshape(-1, 3)
+        texture_types = np.frombuffer(scene.texture_types, dtype=np.int8)
+        shadow_types = np.frombuffer(scene.shadow_types, dtype=np.int8)
+        self.is_stripe = texture_types == TEXTURE_TYPES.index(TEXTURE_TYPE_STRIPE)
+        self.is_checker = texture_types == TEXTURE_TYPES.index(TEXTURE_TYPE_CHECKERBOARD)
+        self.is_smooth = shadow_types == SHADOW_TYPES.index(SHADOW_TYPE_SMOOTH)
+        self.is_sharp = shadow_types == SHADOW_TYPES.index(SHADOW_TYPE_SHARP)
+        self.reflectivity = np.where(np.all(self.colors == GOLD, axis=1), 0.5, 0.3)
+
+        self.lights = image.lights
+        self.stats = image.stats  # RenderStats to count batches into, or None
+        self.stripe_table = getStripeTable()
+
+        # Primary-ray culling: candidate spheres per screen cell (None with a BVH)
+        self.culler = image.primaryCuller()
+        if self.culler is not None:
+            self.cull_masks = np.frombuffer(self.culler.masks, dtype=np.int8).reshape(
+                -1, len(self.radii)).astype(bool)
+        self.background_top = np.array(BACKGROUND_COLOR_TOP, dtype=np.float64)
+        self.background_bottom = np.array(BACKGROUND_COLOR_BOTTOM, dtype=np.float64)
+
+    def intersectSphere(self, index, origins, directions):
+        """Nearest positive ray parameter against one sphere (inf on miss)."""
+        oc = origins - self.centers[index]
+        a = dotRows(directions, directions)
+        b = 2.0 * dotRows(oc, directions)
+        c = dotRows(oc, oc) - self.radii_sq[index]
+        discriminant = b * b - 4 * a * c
+
+        sqrt_disc = np.sqrt(np.maximum(discriminant, 0.0))
+        t1 = (-b - sqrt_disc) / (2.0 * a)
+        t2 = (-b + sqrt_disc) / (2.0 * a)
+
+        t = np.where(t1 > 0, t1, np.where(t2 > 0, t2, np.inf))
+        t[discriminant < 0] = np.inf
+        return t
+
+    def closestHit(self, origins, directions, candidates=None):
+        """
+        Return (t, sphere index) of the nearest hit per ray; index -1 on miss.
+        candidates is an optional (N, spheres) mask of the spheres each ray
+        may hit; others are not tested.
+        """
+        best_t = np.full(len(origins), np.inf)
+        best_index = np.full(len(origins), -1, dtype=np.intp)
+        tests = 0
+        for index in range(len(self.radii)):
+            tested = None if candidates is None else candidates[:, index]
+            if tested is None or tested.all():
+                t = self.intersectSphere(index, origins, directions)
+                tests += len(origins)
+            elif tested.any():
+                t = np.full(len(origins), np.inf)
+                t[tested] = self.intersectSphere(index, origins[tested], directions[tested])
+                tests += int(tested.sum())
+            else:
+                continue
+            closer = t < best_t
+            best_t[closer] = t[closer]
+            best_index[closer] = index
+        if self.stats is not None:
+            self.stats.intersection_tests += tests
+            self.stats.intersection_hits += int((best_index >= 0).sum())
+        return best_t, best_index
+
+    def anyHit(self, origins, directions, t_max=np.inf):
+        """Return a boolean mask of rays that hit any sphere before t_max."""
+        occluded = np.zeros(len(origins), dtype=bool)
+        tests = 0
+        for index in range(len(self.radii)):
+            pending = ~occluded
+            if not pending.any():
+                break
+            t = self.intersectSphere(index, origins[pending], directions[pending])
+            occluded[pending] = t < t_max
+            tests += len(t)
+        if self.stats is not None:
+            self.stats.shadow_rays += len(origins)
+            self.stats.intersection_tests += tests
+            self.stats.intersection_hits += int(occluded.sum())
+        return occluded
+
+    def generateStripeTexture(self, hit_points, base_colors, sphere_centers):
+        """Batched version of Image.generateStripeTexture."""
+        stripe_color = np.array(STRIPE_SHIMMER_COLOR.to_tuple())
+
+        local_points = normalizeRows(hit_points - sphere_centers)
+        angles = np.arctan2(local_points[:, 2], local_points[:, 0])
+        blend = (self.stripe_table.lookupMany(angles, local_points[:, 1]) *
+                 STRIPE_STRENGTH)[:, None]
+        return base_colors * (1 - blend) + stripe_color * blend
+
+    def generateCheckTexture(self, hit_points):
+        """Batched version of Image.generateCheckTexture."""
+        x = np.trunc(hit_points[:, 0] * CHECKERBOARD_SCALE).astype(np.int64)
+        z = np.trunc(hit_points[:, 2] * CHECKERBOARD_SCALE).astype(np.int64)
+
+        even = ((x + z) % 2 == 0)[:, None]
+        return np.where(even, np.array(CHECKER_COLOR_EVEN.to_tuple()),
+                        np.array(CHECKER_COLOR_ODD.to_tuple()))
+
+    def calcBlinnPhongShading(self, origins, hit_points, normals, light):
+        """Batched version of Image.calcBlinnPhongShading."""
+        light_pos = np.array(light.getPosition().to_tuple())
+        light_dir = normalizeRows(light_pos - hit_points)
+        view_dir = normalizeRows(origins - hit_points)
+        half_vector = normalizeRows(light_dir + view_dir)
+
+        diff = np.maximum(0.0, dotRows(normals, light_dir))
+        spec = np.maximum(0.0, dotRows(normals, half_vector)) ** SPECULAR_POWER
+
+        return diff * light.diffuse + spec * light.specular
+
+    def calcShadows(self, hit_points, normals, indices, cells, light):
+        """
+        Batched version of Image.calcShadows. Shadow directions run from the
+        surface to the light unnormalized, so occluders must lie in t < 1.
+        cells are the scramble cells of each ray's pixel.
+        """
+        shadow = np.zeros(len(hit_points))
+        shadow_origins = hit_points + normals * RAY_EPSILON
+        light_pos = np.array(light.getPosition().to_tuple())
+
+        sharp = self.is_sharp[indices]
+        if sharp.any():
+            origins = shadow_origins[sharp]
+            blocked = self.anyHit(origins, light_pos - origins, 1.0)
+            shadow[sharp] = np.where(blocked, 0.95, 0.0)
+
+        smooth = self.is_smooth[indices]
+        if smooth.any():
+            origins = shadow_origins[smooth]
+            shadow_hits = np.zeros(len(origins))
+            shifts = self.light_shifts[cells[smooth]]
+            jitter_range = 0.5
+            for sample in range(SOFT_SHADOW_SAMPLES):
+                point = self.light_table[(self.light_base + sample) % len(self.light_table)]
+                jitter = ((point + shifts) % 1.0 - 0.5) * (2 * jitter_range)
+                shadow_hits += self.anyHit(origins, light_pos + jitter - origins, 1.0)
+            shadow[smooth] = (shadow_hits / SOFT_SHADOW_SAMPLES) * 0.9
+
+        return shadow
+
+    def background(self, directions):
+        """Background gradient for rays that miss every object."""
+        t = (0.5 * (normalizeRows(directions)[:, 1] + 1.0))[:, None]
+        return (1.0 - t) * self.background_bottom + t * self.background_top
+
+    def trace(self, origins, directions, cells, depth=MAX_RAY_DEPTH, candidates=None,
+              quantize=True):
+        """
+        Trace a batch of normalized rays and return (N, 3) colors clamped to
+        0-255, truncated to integers like calculatePixelColor unless
+        quantize is False (floats, like Image.traceColor). Reflections are
+        followed in a loop over the paths still active, each carrying its
+        throughput; a path ends after depth bounces or once its throughput
+        drops below REFLECTION_CUTOFF.
+        cells are the scramble cells of each ray's pixel; candidates is an
+        optional closestHit mask for primary rays.
+        """
+        colors = np.zeros((len(origins), 3))
+        paths = np.arange(len(origins))  # Row of colors each active ray adds to
+        throughput = np.ones(len(origins))
+        primary = True
+        
+        while len(paths):
+            if depth <= 0:
+                colors[paths] += self.background_bottom * (throughput / 255.0)[:, None]
+                break
+            if self.stats is not None:
+                if primary:
+                    self.stats.primary_rays += len(paths)
+                else:
+                    self.stats.reflection_rays += len(paths)
+            
+            t, indices = self.closestHit(origins, directions, candidates)
+            
+            miss = indices < 0
+            if miss.any():
+                colors[paths[miss]] += (self.background(directions[miss]) *
+                                        (throughput[miss] / 255.0)[:, None])
+            
+            hit = ~miss
+            paths = paths[hit]
+            if not len(paths):
+                break
+            origins = origins[hit]
+            directions = directions[hit]
+            cells = cells[hit]
+            indices = indices[hit]
+            hit_points, normals, lit_colors = self.shade(origins, directions, t[hit],
+                                                         indices, cells)
+            
+            # The surface keeps 1 - reflectivity of the path; the rest is reflected
+            reflectivity = self.reflectivity[indices]
+            colors[paths] += lit_colors * (throughput[hit] * (1 - reflectivity))[:, None]
+            throughput = throughput[hit] * reflectivity
+            depth -= 1
+            
+            live = throughput >= REFLECTION_CUTOFF
+            paths = paths[live]
+            throughput = throughput[live]
+            cells = cells[live]
+            if depth > 0:
+                normals = normals[live]
+                directions = directions[live]
+                directions = normalizeRows(
+                    directions - normals * (2 * dotRows(directions, normals))[:, None])
+                origins = hit_points[live] + normals * RAY_EPSILON
+            candidates = None
+            primary = False
+        
+        colors *= 255
+        return np.clip(np.trunc(colors) if quantize else colors, 0, 255)
+
+    def shade(self, origins, directions, t, indices, cells):
+        """
+        Light rays that hit a sphere; returns (hit points, normals, lit colors
+        in 0-1) for the caller to blend with reflections.
+        """
+        hit_points = origins + directions * t[:, None]
+        sphere_centers = self.centers[indices]
+        normals = normalizeRows(hit_points - sphere_centers)
+
+        base_colors = self.colors[indices] / 255.0
+        stripe = self.is_stripe[indices]
+        if stripe.any():
+            base_colors[stripe] = self.generateStripeTexture(
+                hit_points[stripe], base_colors[stripe], sphere_centers[stripe])
+        checker = self.is_checker[indices]
+        if checker.any():
+            base_colors[checker] = self.generateCheckTexture(hit_points[checker])
+        if self.stats is not None:
+            self.stats.texture_evals += int(stripe.sum() + checker.sum())
+
+        lit_colors = np.zeros_like(base_colors)
+        for light in self.lights:
+            diffuse_specular = self.calcBlinnPhongShading(origins, hit_points, normals, light)
+            shadow = self.calcShadows(hit_points, normals, indices, cells, light)
+
+            light_color = np.array(light.getColor().to_tuple())
+            shadow_factor = 1.0 - shadow
+            lit_colors += (base_colors * (diffuse_specular * shadow_factor)[:, None] *
+                           light_color)
+        return hit_points, normals, lit_colors
+
+    def primaryRays(self, cols, rows, cells, sample):
+        """
+        Primary ray directions for AA sample `sample` at each (col, row): the
+        camera's cached direction grid moved by the scrambled sub-pixel
+        offsets, as in Camera.primaryDirections.
+        """
+        camera = self.camera
+        grid = np.frombuffer(camera.directionGrid()).reshape(-1, 3)
+        steps = np.array((camera.horizontal.to_tuple(), camera.vertical.to_tuple()))
+        steps /= np.array([[IMAGE_WIDTH - 1], [IMAGE_HEIGHT - 1]])
+
+        # Offsets repeat per scramble cell, so they are computed per cell only
+        offsets = (self.pixel_table[sample % len(self.pixel_table)] + self.pixel_shifts) % 1.0
+        directions = offsets[cells] @ steps
+        directions += grid[rows * IMAGE_WIDTH + cols]
+        return normalizeRows(directions)
+
+    def scrambleCells(self, cols, rows):
+        """Sampler scramble cell of each (col, row) pixel."""
+        tile = self.sampler.tile_size
+        return (rows % tile) * tile + cols % tile
+
+    def traceSamples(self, cols, rows, sample, quantize=True):
+        """
+        Trace AA sample `sample` of every (col, row) pixel, in batches;
+        quantize as in trace().
+        """
+        cells = self.scrambleCells(cols, rows)
+        self.light_base = sample * self.sampler.light_samples
+        origin = np.array(self.camera.origin.to_tuple())
+        directions = self.primaryRays(cols, rows, cells, sample)
+        candidates = None
+        if self.culler is not None:
+            size = self.culler.cell_size
+            candidates = self.cull_masks[(rows // size) * self.culler.cells_x + cols // size]
+        colors = np.empty((len(directions), 3))
+        for start in range(0, len(directions), NUMPY_BATCH_SIZE):
+            end = start + NUMPY_BATCH_SIZE
+            batch = directions[start:end]
+            origins = np.broadcast_to(origin, batch.shape)
+            colors[start:end] = self.trace(
+                origins, batch, cells[start:end], candidates=(
+                    None if candidates is None else candidates[start:end]),
+                quantize=quantize)
+        return colors
+
+    def tracePass(self, sample):
+        """Trace AA sample `sample` of the whole frame as (pixels, 3) unquantized float colors."""
+        cols, rows = np.meshgrid(np.arange(IMAGE_WIDTH), np.arange(IMAGE_HEIGHT))
+        return self.traceSamples(cols.ravel(), rows.ravel(), sample, quantize=False)
+
+    def renderPixels(self, x0=0, y0=0, x1=IMAGE_WIDTH, y1=IMAGE_HEIGHT, adaptive=False):
+        """
+        Render the region [x0, x1) x [y0, y1) and return (pixels, sample_counts)
+        as region-sized Framebuffers, like Image.tracePixels.
+        """
+        cols, rows = np.meshgrid(np.arange(x0, x1), np.arange(y0, y1))
+        cols = cols.ravel()
+        rows = rows.ravel()
+
+        if adaptive:
+            mean, counts = self.sampleAdaptive(cols, rows)
+        else:
+            accumulated = np.zeros((len(cols), 3))
+            for sample in range(ANTI_ALIASING_SAMPLES):
+                accumulated += self.traceSamples(cols, rows, sample)
+            mean = accumulated / ANTI_ALIASING_SAMPLES
+            counts = np.full(len(cols), ANTI_ALIASING_SAMPLES)
+
+        # Framebuffers store the top row first
+        width, height = x1 - x0, y1 - y0
+        pixels = np.clip(mean, 0, 255).astype(np.uint8).reshape(height, width, 3)[::-1]
+        counts = counts.astype(np.uint16).reshape(height, width)[::-1]
+        return (Framebuffer(width, height, data=bytearray(pixels.tobytes())),
+                Framebuffer(width, height, 1, FRAMEBUFFER_UINT16,
+                            array(FRAMEBUFFER_UINT16, counts.tobytes())))
+
+    def sampleAdaptive(self, cols, rows):
+        """
+        Variance-driven sampling: every pixel gets ADAPTIVE_MIN_SAMPLES, then
+        only pixels whose standard error (worst channel, 0-255 units) is above
+        ADAPTIVE_TOLERANCE get more, up to ADAPTIVE_MAX_SAMPLES.
+        Returns (mean colors, sample counts).
+        """
+        counts = np.zeros(len(cols), dtype=np.int64)
+        mean = np.zeros((len(cols), 3))
+        m2 = np.zeros((len(cols), 3))  # Welford sum of squared deviations
+        active = np.arange(len(cols))
+
+        for sample in range(1, ADAPTIVE_MAX_SAMPLES + 1):
+            colors = self.traceSamples(cols[active], rows[active], sample - 1)
+            counts[active] += 1
+            delta = colors - mean[active]
+            mean[active] += delta / counts[active][:, None]
+            m2[active] += delta * (colors - mean[active])
+
+            if sample >= ADAPTIVE_MIN_SAMPLES:
+                n = counts[active]
+                variance = m2[active].max(axis=1) / np.maximum(n - 1, 1)
+                active = active[np.sqrt(variance / n) > ADAPTIVE_TOLERANCE]
+                if not len(active):
+                    break
+
+        return mean, counts
@@ -0,0 +1,146 @@
+import threading
+import time
+from queue import Queue
+from constants import *
+
+# End-of-stream marker passed down the queues
+_DONE = object()
+
+
+class StageStats:
+    """Item count and time breakdown for one pipeline stage."""
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0      # Seconds spent in the stage function
+        self.starved = 0.0   # Seconds waiting for input
+        self.blocked = 0.0   # Seconds waiting for room in the next queue
+        self.start = None
+        self.end = None
+
+    def wallTime(self):
+        """Seconds between the stage's first input and its last output."""
+        if self.start is None or self.end is None:
+            return 0.0
+        return self.end - self.start
+
+    def throughput(self):
+        """Items per second over the stage's wall time."""
+        wall = self.wallTime()
+        return self.items / wall if wall > 0 else 0.0
+
+    def summary(self):
+        """One-line report; the bottleneck stage is the one with the highest busy %."""
+        capacity = self.wallTime() * self.workers
+        def share(seconds):
+            return 100.0 * seconds / capacity if capacity > 0 else 0.0
+        return (f"{self.name:<8} {self.items:5d} items  {self.throughput():7.2f}/s  "
+                f"busy {share(self.busy):5.1f}%  starved {share(self.starved):5.1f}%  "
+                f"blocked {share(self.blocked):5.1f}%  ({self.workers} thread(s))")
+
+
+class Pipeline:
+    """
+    Runs items through a chain of stages connected by bounded queues.
+    Each stage has its own worker threads; a full queue blocks the stage
+    feeding it, so memory stays flat no matter which stage is slowest.
+    CPU-bound stages should hand their work to a process pool.
+    """
+    def __init__(self, queue_size=PIPELINE_QUEUE_SIZE):
+        """Create an empty pipeline whose queues hold queue_size items."""
+        self.queue_size = queue_size
+        self.stages = []
+        self.stats = []
+        self.error = None
+        self.lock = threading.Lock()
+
+    def addStage(self, name, func, workers=1):
+        """Append a stage that maps each item through func."""
+        self.stages.append((func, workers))
+        self.stats.append(StageStats(name, workers))
+        return self
+
+    def _runStage(self, index, inbox, outbox, remaining, callback):
+        """Worker loop for one thread of stage `index`."""
+        func, _ = self.stages[index]
+        stats = self.stats[index]
+        while True:
+            wait_start = time.time()
+            item = inbox.get()
+            wait_end = time.time()
+            if item is _DONE:
+                break
+
+            with self.lock:
+                if stats.start is None:
+                    stats.start = wait_end  # Startup latency is not starvation
+                else:
+                    stats.starved += wait_end - wait_start
+            if self.error is not None:
+                continue  # Drain so upstream stages never block forever
+
+            try:
+                result = func(item)
+            except BaseException as e:
+                with self.lock:
+                    if self.error is None:
+                        self.error = e
+                continue
+            func_end = time.time()
+
+            if outbox is not None:
+                outbox.put(result)
+            elif callback is not None:
+                with self.lock:
+                    callback(result)
+            put_end = time.time()
+
+            with self.lock:
+                stats.items += 1
+                stats.busy += func_end - wait_end
+                stats.blocked += put_end - func_end
+                stats.end = put_end
+
+        # The last thread of a stage to finish forwards end-of-stream
+        with self.lock:
+            remaining[index] -= 1
+            last = remaining[index] == 0
+        if last and outbox is not None:
+            for _ in range(self.stages[index + 1][1]):
+                outbox.put(_DONE)
+
+    def run(self, items, callback=None):
+        """
+        Feed items through every stage and wait for completion.
+        callback(result) is called for each output of the last stage.
+        Re-raises the first exception raised by any stage.
+        """
+        queues = [Queue(maxsize=self.queue_size) for _ in self.stages]
+        remaining = [workers for _, workers in self.stages]
+        threads = []
+        for index, (_, workers) in enumerate(self.stages):
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+            for _ in range(workers):
+                thread = threading.Thread(
+                    target=self._runStage,
+                    args=(index, queues[index], outbox, remaining, callback),
+                    daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        for item in items:
+            if self.error is not None:
+                break
+            queues[0].put(item)
+        for _ in range(self.stages[0][1]):
+            queues[0].put(_DONE)
+
+        for thread in threads:
+            thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def report(self):
+        """Per-stage summary lines."""
+        return [stats.summary() for stats in self.stats]
@@ -0,0 +1,53 @@
+import math
+import operator
+from array import array
+from constants import *
+from framebuffer import Framebuffer
+
+
+class AccumulationBuffer:
+    """
+    Floating-point running sums of every sample taken for a frame.
+    Passes add one sample per pixel; the image is only quantized to 8 bits
+    when a snapshot is taken, so later passes refine instead of re-averaging
+    already rounded values. Sums of squares give a noise estimate used to
+    stop early on frames that converge quickly.
+    Values are flat r, g, b per pixel, bottom row first.
+    """
+    def __init__(self, width=IMAGE_WIDTH, height=IMAGE_HEIGHT):
+        """Create an empty buffer for a width x height frame."""
+        self.width = width
+        self.height = height
+        self.sums = array('d', bytes(8 * width * height * 3))
+        self.squares = array('d', bytes(8 * width * height * 3))
+        self.samples = 0  # Samples per pixel accumulated so far
+
+    def addPass(self, colors):
+        """Add one sample per pixel given as a flat r, g, b sequence."""
+        if len(colors) != len(self.sums):
+            raise ValueError(f"Pass has {len(colors)} values, expected {len(self.sums)}")
+        self.sums = array('d', map(operator.add, self.sums, colors))
+        self.squares = array('d', map(operator.add, self.squares,
+                                      map(operator.mul, colors, colors)))
+        self.samples += 1
+
+    def standardError(self):
+        """
+        RMS standard error of the per-pixel means in 0-255 units, over all
+        channels; infinite until two samples are in.
+        """
+        n = self.samples
+        if n < 2:
+            return math.inf
+        total = sum(max(0.0, sq - s * s / n) for s, sq in zip(self.sums, self.squares))
+        return math.sqrt(total / (n - 1) / n / len(self.sums))
+
+    def toFramebuffer(self):
+        """Current means as an 8-bit RGB Framebuffer."""
+        scale = 1.0 / max(self.samples, 1)
+        frame = Framebuffer(self.width, self.height)
+        row_values = self.width * 3
+        for row, start in enumerate(range(0, len(self.sums), row_values)):
+            frame.setRow(row, [int(max(0, min(255, s * scale)))
+                               for s in self.sums[start:start + row_values]])
+        return frame
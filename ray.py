@@ -1,9 +1,19 @@
 class Ray:
+    __slots__ = ('origin', 'direction')
+
     def __init__(self, origin, direction):
         """Initialize ray with origin point and direction vector."""
         self.origin = origin
         self.direction = direction.normalize()
 
+    @classmethod
+    def fromUnit(cls, origin, direction):
+        """Ray with an already normalized direction, used as is."""
+        ray = cls.__new__(cls)
+        ray.origin = origin
+        ray.direction = direction
+        return ray
+
     def getOrigin(self):
         """Get ray origin point."""
         return self.origin
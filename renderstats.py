@@ -0,0 +1,194 @@
+import time
+from contextlib import contextmanager
+from constants import *
+from bvh import BVH
+
+# Work counters, in report order
+COUNTERS = ("primary_rays", "reflection_rays", "shadow_rays",
+            "intersection_tests", "intersection_hits", "texture_evals")
+
+# Timed stages of a frame: building the scene, tracing it, writing the file
+STAGES = ("scene", "trace", "write")
+
+# BVH.stats() traversal counters, summed when stats are merged
+BVH_COUNTERS = ("rays", "nodes_visited", "sphere_tests")
+
+
+class RenderStats:
+    """
+    Work counters and stage timings for one frame.
+    Images only carry a RenderStats when statistics are enabled
+    (Image.stats is None otherwise), so disabled stats cost one None check
+    per traced region. The Python engine is counted by instrument(), which
+    wraps the image's tracing methods for the duration of a region; the
+    NumPy engine counts whole batches itself. When the Python engine
+    traces through a BVH, its build and traversal statistics are kept in
+    `bvh` (BVH.stats(), None otherwise).
+    """
+    __slots__ = COUNTERS + ("timings", "bvh")
+
+    def __init__(self):
+        """All counters and timings start at zero."""
+        for name in COUNTERS:
+            setattr(self, name, 0)
+        self.timings = dict.fromkeys(STAGES, 0.0)
+        self.bvh = None
+
+    def merge(self, other):
+        """Add the counts and timings of another RenderStats (e.g. a tile's)."""
+        for name in COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for stage, seconds in other.timings.items():
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+        if other.bvh is not None:
+            self.mergeBVH(other.bvh)
+        return self
+
+    def mergeBVH(self, bvh_stats):
+        """Add BVH.stats() of one traced region (build figures are the same BVH's)."""
+        if self.bvh is None:
+            self.bvh = dict(bvh_stats)
+            return
+        for name in BVH_COUNTERS:
+            self.bvh[name] += bvh_stats[name]
+        rays = max(self.bvh["rays"], 1)
+        self.bvh["nodes_per_ray"] = self.bvh["nodes_visited"] / rays
+        self.bvh["tests_per_ray"] = self.bvh["sphere_tests"] / rays
+
+    @contextmanager
+    def timed(self, stage):
+        """Add the wall time of the block to `stage`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0.0) + time.perf_counter() - start
+
+    def averageDepth(self):
+        """Mean rays traced per primary ray path (1 = no reflection bounces)."""
+        if not self.primary_rays:
+            return 0.0
+        return (self.primary_rays + self.reflection_rays) / self.primary_rays
+
+    def asDict(self):
+        """Flat counters, average depth, per-stage seconds and BVH statistics if any."""
+        row = {name: getattr(self, name) for name in COUNTERS}
+        row["average_depth"] = self.averageDepth()
+        for stage in STAGES:
+            row[f"{stage}_time"] = self.timings.get(stage, 0.0)
+        if self.bvh is not None:
+            row.update((f"bvh_{name}", value) for name, value in self.bvh.items())
+        return row
+
+    def summary(self):
+        """One-line report of the frame's work."""
+        tests = max(self.intersection_tests, 1)
+        line = (f"{self.primary_rays} primary, {self.reflection_rays} reflection, "
+                f"{self.shadow_rays} shadow rays; {self.intersection_tests} tests "
+                f"({100.0 * self.intersection_hits / tests:.0f}% hit); "
+                f"{self.texture_evals} texture evals; depth {self.averageDepth():.2f}; "
+                + ", ".join(f"{stage} {self.timings.get(stage, 0.0):.2f}s"
+                            for stage in STAGES))
+        if self.bvh is not None:
+            bvh = self.bvh
+            line += (f"; BVH {bvh['spheres']} spheres, {bvh['nodes']} nodes, "
+                     f"depth {bvh['max_depth']}, built in {bvh['build_time'] * 1000:.1f}ms, "
+                     f"{bvh['nodes_per_ray']:.1f} nodes/ray, "
+                     f"{bvh['tests_per_ray']:.1f} tests/ray")
+        return line
+
+    @contextmanager
+    def instrument(self, image):
+        """
+        Count the work the Python engine does on image inside the block.
+        Counting wrappers are set as instance attributes and removed on exit,
+        so the image pickles (e.g. to tile workers) exactly as before.
+        """
+        patches = [(image, name, wrapper) for name, wrapper in (
+            ("traceColor", self._countTrace(image.traceColor)),
+            ("reflectedRay", self._countReflection(image.reflectedRay)),
+            ("isOccluded", self._countShadow(image.isOccluded)),
+            ("generateStripeTexture", self._countTexture(image.generateStripeTexture)),
+            ("generateCheckTexture", self._countTexture(image.generateCheckTexture)))]
+        accelerator = image.accelerator
+        patches += [(accelerator, name, self._countQuery(accelerator, name))
+                    for name in ("closestHitRaw", "occluderRaw", "hitsSphereRaw")]
+        patches.append((image.scene, "closestHitAmong",
+                        self._countQuery(image.scene, "closestHitAmong")))
+        bvh = accelerator if isinstance(accelerator, BVH) else None
+        if bvh is not None:
+            bvh.resetStats()
+
+        for target, name, wrapper in patches:
+            setattr(target, name, wrapper)
+        try:
+            yield self
+        finally:
+            for target, name, _ in reversed(patches):
+                target.__dict__.pop(name, None)
+            if bvh is not None:
+                self.mergeBVH(bvh.stats())
+
+    def _countTrace(self, trace):
+        """Wrap traceColor to count primary rays."""
+        def countedTrace(ray, depth=MAX_RAY_DEPTH, candidates=None):
+            self.primary_rays += 1
+            return trace(ray, depth, candidates)
+        return countedTrace
+
+    def _countReflection(self, reflect):
+        """Wrap reflectedRay to count reflection rays."""
+        def countedReflection(ray, hit_record):
+            self.reflection_rays += 1
+            return reflect(ray, hit_record)
+        return countedReflection
+
+    def _countShadow(self, occluded):
+        """Wrap isOccluded to count shadow rays."""
+        def countedOccluded(light, origin, direction):
+            self.shadow_rays += 1
+            return occluded(light, origin, direction)
+        return countedOccluded
+
+    def _countTexture(self, texture):
+        """Wrap a texture method to count evaluations."""
+        def countedTexture(*args):
+            self.texture_evals += 1
+            return texture(*args)
+        return countedTexture
+
+    def _countQuery(self, store, name):
+        """
+        Wrap a ray query of a SceneStore or BVH to count sphere tests and hits.
+        Linear scans test a known number of spheres; a BVH reports its own.
+        """
+        query = getattr(store, name)
+        size = len(store)
+        bvh = isinstance(store, BVH)
+
+        if name == "hitsSphereRaw":
+            def countedQuery(*args):
+                hit = query(*args)
+                self.intersection_tests += 1
+                self.intersection_hits += hit
+                return hit
+        elif name == "closestHitAmong":
+            def countedQuery(indices, *args):
+                index, t = query(indices, *args)
+                self.intersection_tests += len(indices)
+                self.intersection_hits += index >= 0
+                return index, t
+        else:
+            def countedQuery(*args):
+                before = store.sphere_tests if bvh else 0
+                result = query(*args)
+                index = result[0] if name == "closestHitRaw" else result
+                if bvh:
+                    self.intersection_tests += store.sphere_tests - before
+                elif name == "occluderRaw" and index >= 0:
+                    self.intersection_tests += index + 1  # Scan stops at the first occluder
+                else:
+                    self.intersection_tests += size
+                self.intersection_hits += index >= 0
+                return result
+        return countedQuery
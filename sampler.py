@@ -0,0 +1,79 @@
+import random
+from array import array
+from constants import *
+
+# Halton bases for the pixel (u, v) and light (x, y, z) tables
+PIXEL_BASES = (2, 3)
+LIGHT_BASES = (2, 3, 5)
+
+
+def radicalInverse(index, base):
+    """Mirror the base-`base` digits of index about the radix point."""
+    result = 0.0
+    scale = 1.0 / base
+    while index > 0:
+        index, digit = divmod(index, base)
+        result += digit * scale
+        scale /= base
+    return result
+
+
+def haltonTable(count, bases):
+    """First `count` Halton points in len(bases) dimensions, interleaved."""
+    return array('d', (radicalInverse(index, base)
+                       for index in range(count) for base in bases))
+
+
+class Sampler:
+    """
+    Precomputed low-discrepancy sample tables for anti-aliasing and soft shadows.
+    Sample k of every pixel uses Halton point k, shifted by a per-pixel
+    random offset (Cranley-Patterson rotation) so neighbouring pixels do not
+    share a pattern. The tables are built once and reused across frames;
+    only the per-pixel offsets change with the seed.
+    """
+    def __init__(self, seed=SAMPLE_SEED, table_size=SAMPLE_TABLE_SIZE,
+                 tile_size=SCRAMBLE_TILE_SIZE, light_samples=SOFT_SHADOW_SAMPLES):
+        """Build the point tables and the scrambles for `seed`."""
+        self.table_size = table_size
+        self.tile_size = tile_size
+        self.light_samples = light_samples
+        self.pixel_table = haltonTable(table_size, PIXEL_BASES)
+        self.light_table = haltonTable(table_size, LIGHT_BASES)
+
+        self.cell = 0     # Scramble cell of the current pixel
+        self.sample = 0   # AA sample index within the current pixel
+        self.setSeed(seed)
+
+    def setSeed(self, seed):
+        """Draw new per-pixel offsets: u, v for the pixel and x, y, z for lights."""
+        self.seed = seed
+        rng = random.Random(seed)
+        self.pixel_shifts = array('d', (rng.random() for _ in range(self.tile_size ** 2 * 2)))
+        self.light_shifts = array('d', (rng.random() for _ in range(self.tile_size ** 2 * 3)))
+
+    def scrambleCell(self, col, row):
+        """Index of the per-pixel offsets used by pixel (col, row)."""
+        return (row % self.tile_size) * self.tile_size + col % self.tile_size
+
+    def beginSample(self, col, row, sample):
+        """
+        Start AA sample `sample` of pixel (col, row) and return its (du, dv)
+        offset in [0, 1). Later lightJitter calls belong to this sample.
+        """
+        self.cell = cell = self.scrambleCell(col, row)
+        self.sample = sample
+        i = (sample % self.table_size) * 2
+        return ((self.pixel_table[i] + self.pixel_shifts[cell * 2]) % 1.0,
+                (self.pixel_table[i + 1] + self.pixel_shifts[cell * 2 + 1]) % 1.0)
+
+    def lightJitter(self, shadow_sample, jitter_range):
+        """Offset in [-jitter_range, jitter_range)^3 for one soft-shadow sample."""
+        i = ((self.sample * self.light_samples + shadow_sample) % self.table_size) * 3
+        j = self.cell * 3
+        table = self.light_table
+        shifts = self.light_shifts
+        scale = 2 * jitter_range
+        return (((table[i] + shifts[j]) % 1.0 - 0.5) * scale,
+                ((table[i + 1] + shifts[j + 1]) % 1.0 - 0.5) * scale,
+                ((table[i + 2] + shifts[j + 2]) % 1.0 - 0.5) * scale)
@@ -0,0 +1,205 @@
+import math
+from array import array
+from constants import *
+
+# Integer codes used for the per-sphere type arrays
+TEXTURE_TYPES = (TEXTURE_TYPE_NONE, TEXTURE_TYPE_STRIPE, TEXTURE_TYPE_CHECKERBOARD)
+SHADOW_TYPES = ("None", SHADOW_TYPE_SHARP, SHADOW_TYPE_SMOOTH)
+
+INFINITY = float('inf')
+
+
+class RayQueries:
+    """
+    Ray-object and batched query wrappers shared by SceneStore and the BVH.
+    Subclasses implement closestHitRaw and anyHitRaw on scalar components.
+    """
+    def closestHit(self, ray):
+        """Return (index, t) of the nearest hit for a Ray; (-1, inf) on miss."""
+        o = ray.origin
+        d = ray.direction
+        return self.closestHitRaw(o.x, o.y, o.z, d.x, d.y, d.z)
+
+    def anyHit(self, ray, t_max=INFINITY):
+        """Return True if a Ray hits any sphere before t_max."""
+        o = ray.origin
+        d = ray.direction
+        return self.occluderRaw(o.x, o.y, o.z, d.x, d.y, d.z, t_max) >= 0
+
+    def occluder(self, ray, t_max=INFINITY):
+        """Index of some sphere hit by a Ray before t_max, or -1."""
+        o = ray.origin
+        d = ray.direction
+        return self.occluderRaw(o.x, o.y, o.z, d.x, d.y, d.z, t_max)
+
+    def anyHitRaw(self, ox, oy, oz, dx, dy, dz, t_max=INFINITY):
+        """Return True if one ray hits any sphere at a parameter in (0, t_max)."""
+        return self.occluderRaw(ox, oy, oz, dx, dy, dz, t_max) >= 0
+
+    def closestHits(self, origins, directions):
+        """
+        Closest-hit query for N rays given as flat x, y, z sequences.
+        Returns (indices, ts) arrays of length N; index -1 marks a miss.
+        """
+        indices = array('l')
+        ts = array('d')
+        closest = self.closestHitRaw
+        for i in range(0, len(origins), 3):
+            index, t = closest(origins[i], origins[i + 1], origins[i + 2],
+                               directions[i], directions[i + 1], directions[i + 2])
+            indices.append(index)
+            ts.append(t)
+        return indices, ts
+
+    def anyHits(self, origins, directions, t_max=INFINITY):
+        """
+        Any-hit query for N rays given as flat x, y, z sequences, each
+        bounded by t_max. Returns an array of N flags (1 = occluded).
+        """
+        occluder = self.occluderRaw
+        return array('b', (
+            occluder(origins[i], origins[i + 1], origins[i + 2],
+                     directions[i], directions[i + 1], directions[i + 2], t_max) >= 0
+            for i in range(0, len(origins), 3)))
+
+
+class SceneStore(RayQueries):
+    """
+    Structure-of-arrays container for the spheres of a scene.
+    Center components, radii, squared radii, colors and type codes live in
+    contiguous typed arrays so intersection loops avoid per-sphere method
+    calls and tuple allocation. The original Sphere objects are kept in
+    `spheres` (same order) for callers that need them.
+    """
+    def __init__(self, spheres=()):
+        """Create a store, optionally filled from a list of spheres."""
+        self.spheres = []
+        self.center_x = array('d')
+        self.center_y = array('d')
+        self.center_z = array('d')
+        self.radii = array('d')
+        self.radii_sq = array('d')
+        self.colors = array('d')          # Interleaved r, g, b in 0-255
+        self.texture_types = array('b')   # Index into TEXTURE_TYPES
+        self.shadow_types = array('b')    # Index into SHADOW_TYPES
+
+        for sphere in spheres:
+            self.addSphere(sphere)
+
+    def __len__(self):
+        """Number of spheres in the store."""
+        return len(self.spheres)
+
+    def addSphere(self, sphere):
+        """Append a sphere and return its index."""
+        center = sphere.getCenter()
+        radius = sphere.getRadius()
+        self.center_x.append(center.x)
+        self.center_y.append(center.y)
+        self.center_z.append(center.z)
+        self.radii.append(radius)
+        self.radii_sq.append(radius * radius)
+        self.colors.extend(sphere.getColor())
+        self.texture_types.append(TEXTURE_TYPES.index(sphere.getTextureType()))
+        self.shadow_types.append(SHADOW_TYPES.index(sphere.getShadowType()))
+        self.spheres.append(sphere)
+        return len(self.spheres) - 1
+
+    def getTextureType(self, index):
+        """Texture type constant of sphere `index`."""
+        return TEXTURE_TYPES[self.texture_types[index]]
+
+    def getShadowType(self, index):
+        """Shadow type constant of sphere `index`."""
+        return SHADOW_TYPES[self.shadow_types[index]]
+
+    def closestHitRaw(self, ox, oy, oz, dx, dy, dz):
+        """Return (index, t) of the nearest hit for one ray; (-1, inf) on miss."""
+        a = dx * dx + dy * dy + dz * dz
+        best_t = INFINITY
+        best_index = -1
+        index = 0
+        for cx, cy, cz, r2 in zip(self.center_x, self.center_y,
+                                  self.center_z, self.radii_sq):
+            ocx = ox - cx
+            ocy = oy - cy
+            ocz = oz - cz
+            half_b = ocx * dx + ocy * dy + ocz * dz
+            c = ocx * ocx + ocy * ocy + ocz * ocz - r2
+            discriminant = half_b * half_b - a * c
+            if discriminant >= 0:
+                sqrt_disc = math.sqrt(discriminant)
+                t = (-half_b - sqrt_disc) / a
+                if t <= 0:
+                    t = (-half_b + sqrt_disc) / a
+                if 0 < t < best_t:
+                    best_t = t
+                    best_index = index
+            index += 1
+        return best_index, best_t
+
+    def closestHitAmong(self, indices, ox, oy, oz, dx, dy, dz):
+        """closestHitRaw restricted to the spheres in indices (e.g. after culling)."""
+        a = dx * dx + dy * dy + dz * dz
+        best_t = INFINITY
+        best_index = -1
+        center_x, center_y, center_z = self.center_x, self.center_y, self.center_z
+        radii_sq = self.radii_sq
+        for index in indices:
+            ocx = ox - center_x[index]
+            ocy = oy - center_y[index]
+            ocz = oz - center_z[index]
+            half_b = ocx * dx + ocy * dy + ocz * dz
+            c = ocx * ocx + ocy * ocy + ocz * ocz - radii_sq[index]
+            discriminant = half_b * half_b - a * c
+            if discriminant >= 0:
+                sqrt_disc = math.sqrt(discriminant)
+                t = (-half_b - sqrt_disc) / a
+                if t <= 0:
+                    t = (-half_b + sqrt_disc) / a
+                if 0 < t < best_t:
+                    best_t = t
+                    best_index = index
+        return best_index, best_t
+
+    def occluderRaw(self, ox, oy, oz, dx, dy, dz, t_max=INFINITY):
+        """
+        Return the index of the first sphere found that one ray hits at a
+        parameter in (0, t_max), or -1. Stops at the first such hit.
+        """
+        a = dx * dx + dy * dy + dz * dz
+        index = 0
+        for cx, cy, cz, r2 in zip(self.center_x, self.center_y,
+                                  self.center_z, self.radii_sq):
+            ocx = ox - cx
+            ocy = oy - cy
+            ocz = oz - cz
+            half_b = ocx * dx + ocy * dy + ocz * dz
+            c = ocx * ocx + ocy * ocy + ocz * ocz - r2
+            discriminant = half_b * half_b - a * c
+            if discriminant >= 0:
+                sqrt_disc = math.sqrt(discriminant)
+                t = (-half_b - sqrt_disc) / a
+                if t <= 0:
+                    t = (-half_b + sqrt_disc) / a
+                if 0 < t < t_max:
+                    return index
+            index += 1
+        return -1
+
+    def hitsSphereRaw(self, index, ox, oy, oz, dx, dy, dz, t_max=INFINITY):
+        """Return True if one ray hits sphere `index` at a parameter in (0, t_max)."""
+        ocx = ox - self.center_x[index]
+        ocy = oy - self.center_y[index]
+        ocz = oz - self.center_z[index]
+        a = dx * dx + dy * dy + dz * dz
+        half_b = ocx * dx + ocy * dy + ocz * dz
+        c = ocx * ocx + ocy * ocy + ocz * ocz - self.radii_sq[index]
+        discriminant = half_b * half_b - a * c
+        if discriminant < 0:
+            return False
+        sqrt_disc = math.sqrt(discriminant)
+        t = (-half_b - sqrt_disc) / a
+        if t <= 0:
+            t = (-half_b + sqrt_disc) / a
+        return 0 < t < t_max
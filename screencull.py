@@ -0,0 +1,83 @@
+import math
+from array import array
+from constants import *
+
+
+class ScreenCuller:
+    """
+    Per-frame screen-space culling of spheres for primary rays.
+    The frame is divided into cells of cell_size pixels. All primary rays of
+    a cell (jitter included) lie inside a cone from the camera origin; a
+    sphere is kept for the cell only if it can intersect that cone. Most
+    cells end up with one or two candidates, and cells with none go
+    straight to the background gradient. Unlike a projected bounding box
+    this stays tight for the ground sphere, which reaches behind the camera.
+    """
+    def __init__(self, camera, scene, cell_size=CULL_CELL_SIZE):
+        """Find the candidate spheres of every cell for the current camera."""
+        self.cell_size = cell_size
+        self.cells_x = -(-IMAGE_WIDTH // cell_size)
+        self.cells_y = -(-IMAGE_HEIGHT // cell_size)
+        self.scene = scene
+        self.key = self.cameraKey(camera)
+
+        self.candidates = []   # Candidate sphere indices per cell, row-major
+        self.masks = array('b')  # Same as 0/1 flags, cells x spheres
+        for cy in range(self.cells_y):
+            for cx in range(self.cells_x):
+                axis, half_angle = self.cellCone(camera, cx, cy)
+                found = tuple(index for index in range(len(scene))
+                              if self.sphereInCone(camera.origin, axis, half_angle,
+                                                   scene, index))
+                self.candidates.append(found)
+                self.masks.extend(index in found for index in range(len(scene)))
+
+    @staticmethod
+    def cameraKey(camera):
+        """Values of the camera a culler is valid for."""
+        return tuple(vector.to_tuple() for vector in (
+            camera.origin, camera.lower_left, camera.horizontal, camera.vertical))
+
+    def cellCone(self, camera, cx, cy):
+        """Unit axis and half-angle of a cone containing every ray of cell (cx, cy)."""
+        x0 = cx * self.cell_size
+        y0 = cy * self.cell_size
+        x1 = min(x0 + self.cell_size, IMAGE_WIDTH)
+        y1 = min(y0 + self.cell_size, IMAGE_HEIGHT)
+
+        # Pixel col samples s in [col, col + 1) / (IMAGE_WIDTH - 1)
+        corners = [camera.getARay(x / (IMAGE_WIDTH - 1), y / (IMAGE_HEIGHT - 1))
+                   .getDirection().normalize()
+                   for x in (x0, x1) for y in (y0, y1)]
+        axis = (corners[0] + corners[1] + corners[2] + corners[3]).normalize()
+        half_angle = max(math.acos(max(-1.0, min(1.0, axis.dot(corner))))
+                         for corner in corners)
+        return axis, half_angle
+
+    @staticmethod
+    def sphereInCone(origin, axis, half_angle, scene, index):
+        """True if some ray of the cone can hit sphere `index`."""
+        vx = scene.center_x[index] - origin.x
+        vy = scene.center_y[index] - origin.y
+        vz = scene.center_z[index] - origin.z
+        distance = math.sqrt(vx * vx + vy * vy + vz * vz)
+        radius = scene.radii[index]
+        if distance <= radius:
+            return True  # Camera inside the sphere
+        cos_angle = (axis.x * vx + axis.y * vy + axis.z * vz) / distance
+        angle = math.acos(max(-1.0, min(1.0, cos_angle)))
+        return angle <= half_angle + math.asin(radius / distance) + 1e-6
+
+    def candidatesAt(self, col, row):
+        """Indices of the spheres a primary ray of pixel (col, row) can hit."""
+        return self.candidates[(row // self.cell_size) * self.cells_x +
+                               col // self.cell_size]
+
+    def stats(self):
+        """Share of empty cells and mean candidates per cell."""
+        cells = len(self.candidates)
+        return {
+            "cells": cells,
+            "empty_cells": sum(1 for found in self.candidates if not found) / cells,
+            "candidates_per_cell": sum(len(found) for found in self.candidates) / cells,
+        }
@@ -2,6 +2,8 @@ from vector3d import Vector3d
 import math
 
 class Sphere:
+    __slots__ = ('center', 'radius', 'color', 'textureType', 'shadowType')
+
     def __init__(self, center, radius, color, textureType="None", shadowType="None"):
         """Initialize sphere with position, size, and appearance properties."""
         self.center = center
@@ -0,0 +1,47 @@
+import math
+from constants import *
+from vector3d import Vector3d
+from image import Image
+from camera import Camera
+from timeline import Timeline
+
+FRAMES = 240
+
+
+def assertClose(baked, expected):
+    """Baked points match the per-frame ones to within NumPy rounding."""
+    assert len(baked) == len(expected)
+    for a, b in zip(baked, expected):
+        for x, y in ((a.x, b.x), (a.y, b.y), (a.z, b.z)):
+            assert math.isclose(x, y, rel_tol=1e-12, abs_tol=1e-12)
+
+
+def test_bake_matches_animated_positions():
+    timeline = Timeline.bake(FRAMES)
+    evaluator = Image(None)
+    for frame in range(FRAMES):
+        centers, lights, pose = timeline.frameState(frame)
+        expected_centers, expected_lights = evaluator.animatedPositions(frame / FRAMES)
+        assertClose(centers, expected_centers)
+        assertClose(lights, expected_lights)
+        assert pose is None
+
+
+def test_bake_matches_camera_animation():
+    timeline = Timeline.bake(FRAMES, camera_motion=True)
+    camera = Camera(Vector3d(0, 0, 1), Vector3d(0, 0, 0), Vector3d(0, 1, 0),
+                    60.0, CAMERA_ASPECT)
+    for frame in range(FRAMES):
+        camera.updateForAnimation(frame / FRAMES)
+        assertClose(timeline.frameState(frame)[2], [camera.lookFrom, camera.lookAt])
+
+
+def test_save_load_round_trip(tmp_path):
+    timeline = Timeline.bake(FRAMES, camera_motion=True)
+    path = str(tmp_path / "timeline.bin")
+    timeline.save(path)
+    loaded = Timeline.load(path)
+    assert loaded.radii == timeline.radii
+    assert loaded.sphere_centers == timeline.sphere_centers
+    assert loaded.light_positions == timeline.light_positions
+    assert loaded.camera_poses == timeline.camera_poses
@@ -0,0 +1,106 @@
+import math
+from array import array
+from constants import *
+
+# Fraction of the shimmer color mixed in at full stripe blend
+STRIPE_STRENGTH = 0.3
+
+
+def stripeBlend(angle, height):
+    """Analytic stripe blend in [0, 1] at longitude angle and height on a unit sphere."""
+    pattern = (math.sin(height * STRIPE_FREQUENCY + angle * 4) +
+               math.sin(height * 12 - angle * 6) * 0.5)
+    return (math.sin(pattern * math.pi) + 1) * 0.5
+
+
+class StripeTable:
+    """
+    Prefiltered stripe blend baked over (angle, height) on the unit sphere.
+    Each texel is the average of supersample x supersample analytic samples
+    inside it, so lookups are box-filtered rather than point-sampled and
+    thin stripes alias less. Lookups interpolate bilinearly, wrapping in
+    angle ([-pi, pi)) and clamping in height ([-1, 1]). The stored table is
+    padded by one texel on every side (wrapped columns, repeated rows) so a
+    lookup needs no wrap or clamp arithmetic.
+    """
+    def __init__(self, width=STRIPE_TABLE_WIDTH, height=STRIPE_TABLE_HEIGHT,
+                 supersample=STRIPE_TABLE_SUPERSAMPLE):
+        """Bake the table; rows run from height -1 up to +1."""
+        self.width = width
+        self.height = height
+        self.stride = width + 2   # Padded row length
+        self.x_scale = width / (2 * math.pi)
+        self.y_scale = height / 2.0
+
+        texel_angle = 2 * math.pi / width
+        texel_height = 2.0 / height
+        offsets = [(k + 0.5) / supersample for k in range(supersample)]
+        weight = 1.0 / (supersample * supersample)
+        rows = []
+        for j in range(height):
+            heights = [-1.0 + (j + offset) * texel_height for offset in offsets]
+            row = [weight * sum(stripeBlend(a, h) for h in heights for a in angles)
+                   for angles in ([-math.pi + (i + offset) * texel_angle for offset in offsets]
+                                  for i in range(width))]
+            rows.append([row[-1]] + row + [row[0]])
+
+        self.values = array('d')
+        for row in [rows[0]] + rows + [rows[-1]]:
+            self.values.extend(row)
+
+    def lookup(self, angle, height):
+        """Bilinearly interpolated blend at (angle, height)."""
+        # Padded texel coordinates: table texel i is stored at padded index
+        # i + 1 and x (or y) == i + 1 exactly at its centre
+        x = (angle + math.pi) * self.x_scale + 0.5
+        y = (height + 1.0) * self.y_scale + 0.5
+        x0 = int(x)
+        y0 = int(y)
+        fx = x - x0
+        i = y0 * self.stride + x0
+        j = i + self.stride
+        values = self.values
+        a = values[i]
+        b = values[j]
+        bottom = a + (values[i + 1] - a) * fx
+        top = b + (values[j + 1] - b) * fx
+        return bottom + (top - bottom) * (y - y0)
+
+    def lookupMany(self, angles, heights):
+        """
+        lookup over NumPy arrays of angles and heights at once (the NumPy
+        engine's batches), with the same arithmetic per element.
+        """
+        import numpy as np
+        values = np.frombuffer(self.values)
+        x = (angles + math.pi) * self.x_scale + 0.5
+        y = (heights + 1.0) * self.y_scale + 0.5
+        x0 = x.astype(np.int64)
+        y0 = y.astype(np.int64)
+        fx = x - x0
+        i = y0 * self.stride + x0
+        j = i + self.stride
+        a = values[i]
+        b = values[j]
+        bottom = a + (values[i + 1] - a) * fx
+        top = b + (values[j + 1] - b) * fx
+        return bottom + (top - bottom) * (y - y0)
+
+
+# Baked on first use and shared by every Image in the process
+_stripe_table = None
+
+
+def getStripeTable():
+    """The process-wide StripeTable, baked on first call."""
+    global _stripe_table
+    if _stripe_table is None:
+        _stripe_table = StripeTable()
+    return _stripe_table
+
+
+def checkerColor(x, z):
+    """Checkerboard color at ground coordinates (x, z); shared, read-only."""
+    if (int(x * CHECKERBOARD_SCALE) + int(z * CHECKERBOARD_SCALE)) % 2 == 0:
+        return CHECKER_COLOR_EVEN
+    return CHECKER_COLOR_ODD
@@ -0,0 +1,94 @@
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from constants import *
+from renderstats import RenderStats
+from framebuffer import Framebuffer
+
+# Per-process state installed by the pool initializer
+_worker = {}
+
+
+def makeTiles(width, height, tile_size):
+    """Split the image into (x0, y0, x1, y1) tiles of at most tile_size pixels."""
+    return [(x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height))
+            for y0 in range(0, height, tile_size)
+            for x0 in range(0, width, tile_size)]
+
+
+def estimateTileCost(image, tile):
+    """
+    Cheap cost estimate from primary rays through the tile corners and center.
+    Background counts 0, any hit 1, and reflective GOLD/SILVER ornaments 2.
+    """
+    x0, y0, x1, y1 = tile
+    probes = ((x0, y0), (x1 - 1, y0), (x0, y1 - 1), (x1 - 1, y1 - 1),
+              ((x0 + x1) // 2, (y0 + y1) // 2))
+    cost = 0
+    for col, row in probes:
+        ray = image.camera.getARay(col / (IMAGE_WIDTH - 1), row / (IMAGE_HEIGHT - 1))
+        index, _ = image.accelerator.closestHit(ray)
+        if index >= 0:
+            color = image.scene.spheres[index].getColor()
+            cost += 2 if color in (GOLD, SILVER) else 1
+    return cost
+
+
+FRAME_BYTES = IMAGE_WIDTH * IMAGE_HEIGHT * 3
+
+
+def _initWorker(image, engine, adaptive, shm_name):
+    """Attach a pool worker to the scene and the shared framebuffer."""
+    shm = SharedMemory(name=shm_name)
+    _worker.update(image=image, engine=engine, adaptive=adaptive, shm=shm)
+
+
+def _renderTile(tile):
+    """
+    Trace one tile inside a worker and write it to shared memory.
+    Returns the tile, its sample counts (a few bytes per pixel) and, when
+    the image collects statistics, the tile's RenderStats.
+    """
+    image = _worker["image"]
+    if image.stats is not None:
+        image.stats = RenderStats()
+    pixels, counts = image.traceRegion(_worker["engine"], *tile,
+                                       adaptive=_worker["adaptive"])
+    Framebuffer(data=_worker["shm"].buf[:FRAME_BYTES]).paste(pixels, tile[0], tile[1])
+    return tile, counts, image.stats
+
+
+def renderTiled(image, engine=RENDER_ENGINE, workers=1, tile_size=TILE_SIZE,
+                adaptive=ADAPTIVE_SAMPLING):
+    """
+    Render a frame as tiles spread over a process pool.
+    Tiles are handed out one at a time, most expensive first, so ornament
+    tiles start early and no worker idles while others finish. Workers write
+    straight into a shared-memory framebuffer; only tile coordinates and
+    sample counts travel back through the pool.
+    Returns (pixels, sample_counts) as full-frame Framebuffers.
+    """
+    tiles = makeTiles(IMAGE_WIDTH, IMAGE_HEIGHT, tile_size)
+    tiles.sort(key=lambda tile: estimateTileCost(image, tile), reverse=True)
+
+    sample_counts = Framebuffer(channels=1, typecode=FRAMEBUFFER_UINT16)
+
+    if workers <= 1:
+        frame = Framebuffer()
+        for tile in tiles:
+            pixels, counts = image.traceRegion(engine, *tile, adaptive=adaptive)
+            frame.paste(pixels, tile[0], tile[1])
+            sample_counts.paste(counts, tile[0], tile[1])
+        return frame, sample_counts
+
+    shm = SharedMemory(create=True, size=FRAME_BYTES)
+    try:
+        with Pool(processes=workers, initializer=_initWorker,
+                  initargs=(image, engine, adaptive, shm.name)) as pool:
+            for tile, counts, stats in pool.imap_unordered(_renderTile, tiles, chunksize=1):
+                sample_counts.paste(counts, tile[0], tile[1])
+                if stats is not None:
+                    image.stats.merge(stats)
+        return Framebuffer(data=bytearray(shm.buf[:FRAME_BYTES])), sample_counts
+    finally:
+        shm.close()
+        shm.unlink()
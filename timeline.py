@@ -0,0 +1,245 @@
+import json
+import math
+import os
+import sys
+from array import array
+from constants import *
+from vector3d import Vector3d
+
+
+def bezierPoints(t, p0, p1, p2, p3):
+    """Image.bezierPoint (eased cubic Bezier) at every time of array t, as (frames, 3)."""
+    import numpy as np
+    t = -(np.cos(math.pi * t) - 1) / 2
+    t = t[:, None]
+    p0, p1, p2, p3 = (np.array(point.to_tuple()) for point in (p0, p1, p2, p3))
+    return (p0 * (1 - t) ** 3 +
+            p1 * 3 * t * (1 - t) ** 2 +
+            p2 * 3 * t ** 2 * (1 - t) +
+            p3 * t ** 3)
+
+
+def animatedPositions(t):
+    """
+    Image.animatedPositions at every time of array t: (centers, lights) as
+    (frames, 3, 3) and (frames, 2, 3) arrays.
+    """
+    import numpy as np
+    red = bezierPoints(t, P0, P1, P2, P3)
+    red[:, 1] += np.sin(t * math.pi * 2) * BOUNCE_AMOUNT
+
+    angle = t * CIRCLE_ORBIT_SPEED * math.pi * 2
+    orbit_radius = CIRCLE_RADIUS + np.sin(t * math.pi * 2) * 0.2
+    gold = np.stack([np.cos(angle) * orbit_radius,
+                     CIRCLE_HEIGHT + np.sin(t * CIRCLE_VERTICAL_SPEED * math.pi) * BOUNCE_AMOUNT,
+                     np.sin(angle) * orbit_radius - 2], axis=1)
+
+    silver = bezierPoints(t, P0_2, P1_2, P2_2, P3_2)
+    silver[:, 1] += np.cos(t * math.pi * 3) * BOUNCE_AMOUNT * 0.5
+
+    angle = t * math.pi * 2
+    light_radius = 8.0
+    height_offset = np.sin(t * math.pi * 2) * 2.0
+    lights = np.stack([
+        np.stack([np.cos(angle) * light_radius, 8 + height_offset,
+                  np.sin(angle) * light_radius], axis=1),
+        np.stack([np.cos(angle + math.pi) * light_radius, 6 - height_offset,
+                  np.sin(angle + math.pi) * light_radius], axis=1)], axis=1)
+    return np.stack([red, gold, silver], axis=1), lights
+
+
+def cameraPoses(t):
+    """Camera.updateForAnimation's (lookFrom, lookAt) at every time of array t, as (frames, 2, 3)."""
+    import numpy as np
+    # Phase 1: graceful descent
+    phase_t = t / PHASE_1_END
+    angle = phase_t * math.pi * 0.5
+    radius = 12 - phase_t * 2
+    opening = np.stack([
+        np.stack([np.cos(angle) * radius,
+                  12 - phase_t * 4 + np.sin(phase_t * math.pi * 2) * 0.5,
+                  np.sin(angle) * radius + 8], axis=1),
+        np.stack([np.zeros_like(t), 1 - phase_t, np.full_like(t, -2.0)], axis=1)], axis=1)
+
+    # Phase 2: orbital movement
+    phase_t = (t - PHASE_1_END) / (PHASE_2_END - PHASE_1_END)
+    angle = phase_t * math.pi * 3
+    dance = np.stack([
+        np.stack([np.cos(angle) * 10,
+                  8 + np.sin(phase_t * math.pi * 4) * 1.0,
+                  np.sin(angle) * 10 + 6], axis=1),
+        np.stack([np.zeros_like(t), 2 + np.sin(phase_t * math.pi * 2),
+                  np.full_like(t, -2.0)], axis=1)], axis=1)
+
+    # Phase 3: rising spiral
+    phase_t = (t - PHASE_2_END) / (PHASE_3_END - PHASE_2_END)
+    angle = phase_t * math.pi * 2
+    radius = 8 + phase_t * 2
+    finale = np.stack([
+        np.stack([np.cos(angle) * radius,
+                  8 + phase_t * 6 + np.sin(phase_t * math.pi * 3) * 0.5,
+                  np.sin(angle) * radius + 6], axis=1),
+        np.stack([np.zeros_like(t), 4 + phase_t * 3, np.full_like(t, -2.0)], axis=1)], axis=1)
+
+    phase = np.where(t < PHASE_1_END, 0, np.where(t < PHASE_2_END, 1, 2))
+    return np.choose(phase[:, None, None], (opening, dance, finale))
+
+
+class Timeline:
+    """
+    Animated scene state for every frame of a job, baked once up front:
+    the ornament centers, the light positions and, when the camera moves,
+    its (lookFrom, lookAt) pose. Values are kept as flat arrays of doubles,
+    frame-major, so a frame's scene is a slice away and the whole job's
+    motion can be inspected before anything is traced.
+    """
+    VERSION = 1
+
+    def __init__(self, total_frames, sphere_centers, light_positions, radii,
+                 camera_poses=None):
+        """
+        Wrap baked data: per frame, len(radii) centers and the light positions
+        as xyz triples, plus optionally two xyz triples of camera pose.
+        """
+        self.total_frames = total_frames
+        self.radii = list(radii)
+        self.sphere_count = len(self.radii)
+        self.light_count = len(light_positions) // (3 * total_frames) if total_frames else 0
+        self.sphere_centers = array('d', sphere_centers)
+        self.light_positions = array('d', light_positions)
+        self.camera_poses = None if camera_poses is None else array('d', camera_poses)
+
+    @classmethod
+    def bake(cls, total_frames, camera_motion=False):
+        """
+        Evaluate the animation for frames 0..total_frames-1 in one vectorized
+        NumPy pass (animatedPositions and cameraPoses mirror
+        Image.animatedPositions and Camera.updateForAnimation, to within
+        rounding of NumPy's transcendental functions).
+        """
+        import numpy as np
+        from image import Image
+
+        evaluator = Image(None)
+        evaluator.createAnimatedScene(0.0)
+        t = np.arange(total_frames) / total_frames
+        centers, lights = animatedPositions(t)
+        radii = [sphere.radius for sphere in evaluator.scene_objects[:centers.shape[1]]]
+        poses = array('d', cameraPoses(t).tobytes()) if camera_motion else None
+        return cls(total_frames, array('d', centers.tobytes()), array('d', lights.tobytes()),
+                   radii, poses)
+
+    def _points(self, values, index, count):
+        """The count xyz triples of frame index in a flat array, as Vector3d."""
+        start = index * count * 3
+        return [Vector3d(*values[i:i + 3]) for i in range(start, start + count * 3, 3)]
+
+    def frameState(self, index):
+        """(sphere centers, light positions, camera pose or None) of frame index."""
+        if not 0 <= index < self.total_frames:
+            raise IndexError(f"frame {index} outside timeline of {self.total_frames} frames")
+        pose = None
+        if self.camera_poses is not None:
+            pose = self._points(self.camera_poses, index, 2)
+        return (self._points(self.sphere_centers, index, self.sphere_count),
+                self._points(self.light_positions, index, self.light_count), pose)
+
+    def applyTo(self, image, index):
+        """Build frame index's scene (and camera pose, if baked) on image."""
+        centers, lights, pose = self.frameState(index)
+        image.buildScene(centers, lights)
+        if pose is not None:
+            image.camera.setPose(*pose)
+
+    def motionBounds(self):
+        """
+        Per-ornament axis-aligned box (min xyz, max xyz) swept over the whole
+        timeline, including the sphere radius.
+        """
+        bounds = []
+        stride = self.sphere_count * 3
+        for sphere, radius in enumerate(self.radii):
+            lo, hi = [], []
+            for axis in range(3):
+                values = self.sphere_centers[sphere * 3 + axis::stride]
+                lo.append(min(values) - radius)
+                hi.append(max(values) + radius)
+            bounds.append((tuple(lo), tuple(hi)))
+        return bounds
+
+    def summary(self):
+        """One-line description of the baked job."""
+        camera = "moving camera" if self.camera_poses is not None else "fixed camera"
+        return (f"{self.total_frames} frames, {self.sphere_count} animated spheres, "
+                f"{self.light_count} lights, {camera}")
+
+    def save(self, path):
+        """
+        Write a JSON header line followed by the raw doubles, atomically
+        (temporary file, fsync, rename).
+        """
+        header = {"version": self.VERSION, "total_frames": self.total_frames,
+                  "radii": self.radii, "lights": self.light_count,
+                  "camera": self.camera_poses is not None, "byteorder": sys.byteorder}
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(json.dumps(header, sort_keys=True).encode("utf-8") + b"\n")
+            self.sphere_centers.tofile(f)
+            self.light_positions.tofile(f)
+            if self.camera_poses is not None:
+                self.camera_poses.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a timeline written by save(); raises ValueError if it is malformed."""
+        with open(path, "rb") as f:
+            header = json.loads(f.readline().decode("utf-8"))
+            if not isinstance(header, dict) or header.get("version") != cls.VERSION:
+                raise ValueError(f"{path}: not a version {cls.VERSION} timeline")
+            missing = [key for key in ("total_frames", "radii", "lights", "camera", "byteorder")
+                       if key not in header]
+            if missing:
+                raise ValueError(f"{path}: timeline header lacks {', '.join(missing)}")
+            frames = header["total_frames"]
+            radii = header["radii"]
+            sections = [frames * len(radii) * 3, frames * header["lights"] * 3]
+            if header["camera"]:
+                sections.append(frames * 6)
+
+            values = []
+            for count in sections:
+                section = array('d')
+                try:
+                    section.fromfile(f, count)
+                except EOFError:
+                    raise ValueError(f"{path}: truncated timeline")
+                if header["byteorder"] != sys.byteorder:
+                    section.byteswap()
+                values.append(section)
+            if f.read(1):
+                raise ValueError(f"{path}: trailing data after timeline")
+
+        poses = values[2] if header["camera"] else None
+        return cls(frames, values[0], values[1], radii, poses)
+
+
+# Loaded on first use and shared by every frame a process renders
+_timelines = {}
+
+
+def getTimeline(path):
+    """
+    The process-wide Timeline stored at path, loaded on first call and
+    again whenever the file is replaced.
+    """
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _timelines.get(path)
+    if cached is None or cached[0] != key:
+        cached = _timelines[path] = (key, Timeline.load(path))
+    return cached[1]
@@ -266,7 +266,10 @@ import math
 class Vector3d:
     """
     A 3D vector class with methods for common vector operations.
+    Uses __slots__ so each instance is a fixed three-field record.
     """
+    __slots__ = ('x', 'y', 'z')
+
     def __init__(self, x, y, z):
         """Initialize a vector with x, y, z components."""
         self.x = float(x)
@@ -293,7 +296,7 @@ class Vector3d:
 
     def cross(self, other):
         """Calculate cross product with another vector."""
-        return Vector3d(
+        return _vector(
             self.y * other.z - self.z * other.y,
             self.z * other.x - self.x * other.z,
             self.x * other.y - self.y * other.x
@@ -311,7 +314,7 @@ class Vector3d:
         """Return a normalized copy of the vector."""
         length = self.length()
         if length > 0:
-            return Vector3d(
+            return _vector(
                 self.x / length,
                 self.y / length,
                 self.z / length
@@ -337,7 +340,7 @@ class Vector3d:
     # Arithmetic operations
     def __add__(self, other):
         """Vector addition."""
-        return Vector3d(
+        return _vector(
             self.x + other.x,
             self.y + other.y,
             self.z + other.z
@@ -345,7 +348,7 @@ class Vector3d:
 
     def __sub__(self, other):
         """Vector subtraction."""
-        return Vector3d(
+        return _vector(
             self.x - other.x,
             self.y - other.y,
             self.z - other.z
@@ -353,16 +356,16 @@ class Vector3d:
 
     def __mul__(self, other):
         """Multiplication by scalar or vector."""
-        if isinstance(other, (int, float)):
-            return Vector3d(
-                self.x * other,
-                self.y * other,
-                self.z * other
+        if isinstance(other, Vector3d):
+            return _vector(
+                self.x * other.x,
+                self.y * other.y,
+                self.z * other.z
             )
-        return Vector3d(
-            self.x * other.x,
-            self.y * other.y,
-            self.z * other.z
+        return _vector(
+            self.x * other,
+            self.y * other,
+            self.z * other
         )
 
     def __rmul__(self, other):
@@ -375,7 +378,7 @@ class Vector3d:
             if other == 0:
                 raise ValueError("Division by zero")
             inv = 1.0 / other
-            return Vector3d(
+            return _vector(
                 self.x * inv,
                 self.y * inv,
                 self.z * inv
@@ -384,7 +387,65 @@ class Vector3d:
 
     def __neg__(self):
         """Vector negation."""
-        return Vector3d(-self.x, -self.y, -self.z)
+        return _vector(-self.x, -self.y, -self.z)
+
+    # In-place and fused operations (mutate self and return it, no allocation)
+    def __iadd__(self, other):
+        """In-place vector addition."""
+        self.x += other.x
+        self.y += other.y
+        self.z += other.z
+        return self
+
+    def __isub__(self, other):
+        """In-place vector subtraction."""
+        self.x -= other.x
+        self.y -= other.y
+        self.z -= other.z
+        return self
+
+    def __imul__(self, other):
+        """In-place multiplication by scalar or vector."""
+        if isinstance(other, Vector3d):
+            self.x *= other.x
+            self.y *= other.y
+            self.z *= other.z
+        else:
+            self.x *= other
+            self.y *= other
+            self.z *= other
+        return self
+
+    def set(self, x, y, z):
+        """Overwrite all three components."""
+        self.x = x
+        self.y = y
+        self.z = z
+        return self
+
+    def addScaled(self, other, scale):
+        """self += other * scale."""
+        self.x += other.x * scale
+        self.y += other.y * scale
+        self.z += other.z * scale
+        return self
+
+    def mulAdd(self, a, b, scale=1.0):
+        """self += a * b * scale (component-wise product of a and b)."""
+        self.x += a.x * b.x * scale
+        self.y += a.y * b.y * scale
+        self.z += a.z * b.z * scale
+        return self
+
+    def normalizeInPlace(self):
+        """Normalize to unit length in place; a zero vector stays zero."""
+        length = math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+        if length > 0:
+            inv = 1.0 / length
+            self.x *= inv
+            self.y *= inv
+            self.z *= inv
+        return self
 
     # Comparison operations
     def __eq__(self, other):
@@ -415,7 +476,7 @@ class Vector3d:
 
     def copy(self):
         """Create a copy of this vector."""
-        return Vector3d(self.x, self.y, self.z)
+        return _vector(self.x, self.y, self.z)
 
     @staticmethod
     def zero():
@@ -440,4 +501,16 @@ class Vector3d:
     @staticmethod
     def forward():
         """Return a forward vector."""
-        return Vector3d(0, 0, 1)
\ No newline at end of file
+        return Vector3d(0, 0, 1)
+
+
+_object_new = object.__new__
+
+
+def _vector(x, y, z):
+    """Build a Vector3d from values that are already floats, skipping float()."""
+    vector = _object_new(Vector3d)
+    vector.x = x
+    vector.y = y
+    vector.z = z
+    return vector
\ No newline at end of file
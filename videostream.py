@@ -0,0 +1,94 @@
+import subprocess
+from constants import *
+
+
+class ReorderBuffer:
+    """
+    Releases frames to a sink strictly in index order.
+    Frames that arrive early are held until the gap before them is filled;
+    at most `capacity` frames may be held at once.
+    """
+    def __init__(self, sink, capacity, start=0):
+        """Create a buffer that calls sink(data) for each frame in order."""
+        self.sink = sink
+        self.capacity = capacity
+        self.next_index = start
+        self.pending = {}
+
+    def push(self, index, data):
+        """Accept frame `index` and release every frame that is now in order."""
+        if index < self.next_index or index in self.pending:
+            raise ValueError(f"Frame {index} delivered twice")
+        if index != self.next_index and len(self.pending) >= self.capacity:
+            raise OverflowError(f"Reorder buffer full ({self.capacity} frames) "
+                                f"while waiting for frame {self.next_index}")
+
+        self.pending[index] = data
+        while self.next_index in self.pending:
+            self.sink(self.pending.pop(self.next_index))
+            self.next_index += 1
+
+    def __len__(self):
+        """Number of frames waiting for an earlier frame."""
+        return len(self.pending)
+
+
+class FFmpegStream:
+    """
+    Pipes raw RGB24 frames into a local ffmpeg process that encodes the
+    video as they arrive, so no per-frame files are written.
+    Frames must be packed top-to-bottom RGB bytes (see Framebuffer.tobytes).
+    """
+    def __init__(self, output_path, width=IMAGE_WIDTH, height=IMAGE_HEIGHT, fps=FPS,
+                 ffmpeg="ffmpeg", codec_args=("-c:v", "libx264", "-pix_fmt", "yuv420p",
+                                              "-crf", "22")):
+        """Configure the encoder; the process starts on open()."""
+        self.output_path = output_path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.ffmpeg = ffmpeg
+        self.codec_args = list(codec_args)
+        self.process = None
+        self.frames_written = 0
+
+    def command(self):
+        """ffmpeg command line reading rawvideo from stdin."""
+        return ([self.ffmpeg, "-y", "-loglevel", "error",
+                 "-f", "rawvideo", "-pix_fmt", "rgb24",
+                 "-s", f"{self.width}x{self.height}", "-r", str(self.fps),
+                 "-i", "-"] + self.codec_args + [self.output_path])
+
+    def open(self):
+        """Start the ffmpeg process."""
+        self.process = subprocess.Popen(self.command(), stdin=subprocess.PIPE)
+        return self
+
+    def writeFrame(self, rgb):
+        """Send one frame to the encoder."""
+        if len(rgb) != self.width * self.height * 3:
+            raise ValueError(f"Frame has {len(rgb)} bytes, expected "
+                             f"{self.width * self.height * 3}")
+        self.process.stdin.write(rgb)
+        self.frames_written += 1
+
+    def close(self):
+        """Finish the stream and wait for ffmpeg to exit."""
+        if self.process is None:
+            return
+        self.process.stdin.close()
+        returncode = self.process.wait()
+        self.process = None
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with status {returncode}")
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.process is not None:
+            # Abandon a partial video instead of masking the original error
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+        self.close()